@@ -7,6 +7,7 @@ from google.genai import types
 
 from agents.anonymous_ticket_support_sub_agent import create_anonymous_ticket_support_sub_agent
 from agents.generic_sub_agent import create_generic_sub_agent
+from utils.adk_sessions import release_adk_session
 from utils.redis_session_service import ChatMessage
 from utils.request_context import RequestContext  # ✅ ADD THIS IMPORT
 
@@ -92,23 +93,33 @@ class AnonymousKarmayogiCustomerAgent:
         self.request_context.session_id = session_id  # ✅ FIXED: Update context too
         logger.info(f"Set session ID in AnonymousKarmayogiCustomerAgent: {session_id}")
 
-    def _initialize_sub_agents(self):
-        """Initialize sub-agents available to anonymous users (THREAD-SAFE)"""
-        if not self.TICKET_SUPPORT_agent:
-            self.TICKET_SUPPORT_agent = create_anonymous_ticket_support_sub_agent(
-                self.opik_tracer,
-                self.request_context  # ✅ FIXED: Pass RequestContext instead of separate params
-            )
-
-        if not self.generic_agent:
-            self.generic_agent = create_generic_sub_agent(
-                self.opik_tracer,
-                self.request_context  # ✅ FIXED: Pass RequestContext instead of separate params
-            )
+    # Intent -> (attribute, factory). Sub-agents bind the request context, so only the routed one is built
+    _SUB_AGENT_FACTORIES = {
+        "TICKET_SUPPORT": ("TICKET_SUPPORT_agent", create_anonymous_ticket_support_sub_agent),
+        "GENERAL_SUPPORT": ("generic_agent", create_generic_sub_agent),
+    }
+
+    def _get_sub_agent(self, intent: str) -> Agent:
+        """Create the sub-agent for an intent on first use (THREAD-SAFE)"""
+        attr, factory = self._SUB_AGENT_FACTORIES[intent]
+        agent = getattr(self, attr)
+        if agent is None:
+            agent = factory(self.opik_tracer, self.request_context)
+            setattr(self, attr, agent)
+        return agent
 
     async def route_query(self, user_message: str, session_service, session_id: str, user_id: str,
-                          request_context: RequestContext) -> str:  # ✅ FIXED: Accept RequestContext
+                          request_context: RequestContext) -> str:
         """Improved routing for anonymous users with thread-safe context"""
+        try:
+            return await self._route_query(user_message, session_service, session_id, user_id, request_context)
+        finally:
+            # The ADK session service is shared across requests, so drop this request's sessions
+            await release_adk_session(session_service, "anonymous_intent_classifier", user_id, f"anonymous_intent_{session_id}")
+
+    async def _route_query(self, user_message: str, session_service, session_id: str, user_id: str,
+                           request_context: RequestContext) -> str:
+        """Classify intent and dispatch to the matching sub-agent"""
 
         # ✅ FIXED: Update the request context (ensure thread safety)
         self.request_context = request_context
@@ -116,8 +127,6 @@ class AnonymousKarmayogiCustomerAgent:
         current_chat_history = self.request_context.chat_history or []
         logger.info(f"Routing anonymous user query with {len(current_chat_history)} history messages")
 
-        self._initialize_sub_agents()
-
         # Build context for classification
         classification_context = await self._build_anonymous_classification_context(request_context.get_processing_message(), current_chat_history)
 
@@ -165,7 +174,7 @@ class AnonymousKarmayogiCustomerAgent:
             if "TICKET_SUPPORT" in intent_classification.upper():
                 logger.info("Routing anonymous user to ticket creation sub-agent")
                 return await self._run_sub_agent(
-                    self.TICKET_SUPPORT_agent,
+                    self._get_sub_agent("TICKET_SUPPORT"),
                     request_context.get_processing_message(),
                     session_service,
                     f"anonymous_ticket_{session_id}",
@@ -175,7 +184,7 @@ class AnonymousKarmayogiCustomerAgent:
             else:
                 logger.info("Routing anonymous user to generic sub-agent")
                 return await self._run_sub_agent(
-                    self.generic_agent,
+                    self._get_sub_agent("GENERAL_SUPPORT"),
                     request_context.get_processing_message(),
                     session_service,
                     f"anonymous_generic_{session_id}",
@@ -191,7 +200,7 @@ class AnonymousKarmayogiCustomerAgent:
             if route_decision == "TICKET_SUPPORT":
                 logger.info("Fallback: routing anonymous user to ticket creation")
                 return await self._run_sub_agent(
-                    self.TICKET_SUPPORT_agent,
+                    self._get_sub_agent("TICKET_SUPPORT"),
                     request_context.get_processing_message(),
                     session_service,
                     f"anonymous_ticket_{session_id}",
@@ -201,7 +210,7 @@ class AnonymousKarmayogiCustomerAgent:
             else:
                 logger.info("Fallback: routing anonymous user to general support")
                 return await self._run_sub_agent(
-                    self.generic_agent,
+                    self._get_sub_agent("GENERAL_SUPPORT"),
                     request_context.get_processing_message(),
                     session_service,
                     f"anonymous_generic_{session_id}",
@@ -271,8 +280,18 @@ class AnonymousKarmayogiCustomerAgent:
             return user_message
 
     async def _run_sub_agent(self, agent: Agent, user_message: str, session_service, session_id: str,
-                             user_id: str, request_context: RequestContext) -> str:  # ✅ FIXED: Accept RequestContext
+                             user_id: str, request_context: RequestContext) -> str:
         """Run a sub-agent for anonymous users (THREAD-SAFE)"""
+        try:
+            return await self._run_sub_agent_session(
+                agent, user_message, session_service, session_id, user_id, request_context
+            )
+        finally:
+            await release_adk_session(session_service, f"anonymous_{agent.name}", user_id, session_id)
+
+    async def _run_sub_agent_session(self, agent: Agent, user_message: str, session_service, session_id: str,
+                                     user_id: str, request_context: RequestContext) -> str:
+        """Create the sub-agent session, run the agent and collect its text response"""
 
         current_chat_history = request_context.chat_history or []
         logger.info(f"Running {agent.name} for anonymous user with {len(current_chat_history)} history messages")
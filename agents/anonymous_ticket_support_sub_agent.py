@@ -19,14 +19,15 @@ async def provide_support_information(user_message: str, request_context: Reques
         if not request_context:
             return {"success": False, "error": "Request context not available"}
 
-        print(f"Searching knowledge base for: {user_message}")
+        logger.info(f"Searching knowledge base for: {user_message}")
 
         # Get context data from request_context
         current_chat_history = request_context.chat_history or []
         user_context = request_context.user_context or {}
 
         # Import functions locally to avoid global state issues
-        from utils.common_utils import rephrase_query_with_history, call_gemini_api, call_local_llm
+        from utils.common_utils import (rephrase_query_with_history, call_gemini_api, call_local_llm,
+                                        search_knowledge_base)
 
         # Build chat history context
         history_context = ""
@@ -38,16 +39,16 @@ async def provide_support_information(user_message: str, request_context: Reques
                 history_context += f"{role}: {content}\n"
 
         # Step 1: Rephrase the query based on chat history
-        print(f"Original user message: {user_message}")
+        logger.debug(f"Original user message: {user_message}")
         if len(user_message.split()) < 4:
             rephrased_query = await rephrase_query_with_history(user_message, current_chat_history)
         else:
             rephrased_query = user_message
-        print(f"Rephrased query: {rephrased_query}")
+        logger.debug(f"Rephrased query: {rephrased_query}")
 
         # Step 2: Query Qdrant with SentenceTransformer embeddings
-        print(f"Querying knowledge base for: {rephrased_query}")
-        qdrant_results = await query_qdrant_with_sentence_transformer(rephrased_query, limit=5, threshold=0.7)
+        logger.info(f"Querying knowledge base for: {rephrased_query}")
+        qdrant_results = await search_knowledge_base(rephrased_query, limit=5, threshold=0.7)
 
         # Step 3: Build response based on search results
         user_name = "Guest"
@@ -85,12 +86,12 @@ CRITICAL: End your response with: "For additional assistance, please contact us
 Provide a comprehensive, helpful response based on the available information.
 """
 
-            print(f"System message: {system_message}")
+            logger.debug(f"System message: {system_message}")
             response = await call_gemini_api(system_message)
 
             # Fallback to local LLM if Gemini fails
             if not response:
-                print("Gemini API failed, falling back to local LLM")
+                logger.warning("Gemini API failed, falling back to local LLM")
                 response = await call_local_llm(system_message, rephrased_query)
 
             if response:
@@ -125,47 +126,6 @@ Provide a comprehensive, helpful response based on the available information.
         }
 
 
-async def query_qdrant_with_sentence_transformer(query: str, limit: int = 5, threshold: float = 0.7):
-    """Query Qdrant using SentenceTransformer embeddings"""
-    try:
-        from utils.common_utils import generate_embeddings, qdrant_client
-
-        query_embeddings = await generate_embeddings([query])
-        query_vector = query_embeddings[0]
-
-        if not isinstance(query_vector, list) or not all(isinstance(x, (int, float)) for x in query_vector):
-            print(f"Invalid query_vector format: {type(query_vector)}")
-            raise ValueError("Query vector must be a flat list of floats")
-
-        search_result = qdrant_client.search(
-            collection_name="igot_docs",
-            query_vector=query_vector,
-            limit=limit,
-            score_threshold=threshold
-        )
-
-        results = []
-        for point in search_result:
-            result = {
-                "id": point.id,
-                "score": point.score,
-                "title": point.payload.get("title", "Untitled"),
-                "content": point.payload.get("content", ""),
-                "category": point.payload.get("category", "General"),
-                "tags": point.payload.get("tags", []),
-                "text": point.payload.get("text", point.payload.get("content", "")),
-                **point.payload
-            }
-            results.append(result)
-
-        print(f"Knowledge base search returned {len(results)} results above threshold {threshold}")
-        return results
-
-    except Exception as e:
-        print(f"Error querying knowledge base: {e}")
-        return []
-
-
 def create_anonymous_ticket_support_sub_agent(opik_tracer, request_context: RequestContext) -> Agent:
     """
     Create a specialized sub-agent for providing support information to anonymous/guest users.
@@ -194,7 +154,7 @@ WORKFLOW:
 CRITICAL: Never claim to create tickets. Only provide information or direct to support contact.
 """
 
-    print(f"Creating anonymous support agent (no ticket creation) with request_context: {request_context}")
+    logger.debug(f"Creating anonymous support agent (no ticket creation) with request_context: {request_context}")
 
     # Create tools that will receive context as parameter
     def make_tool_with_context(tool_func):
@@ -208,7 +168,7 @@ CRITICAL: Never claim to create tickets. Only provide information or direct to s
 
     tools = [make_tool_with_context(provide_support_information)]
 
-    print("Creating anonymous support agent with knowledge-base-only tools:", tools)
+    logger.debug(f"Creating anonymous support agent with knowledge-base-only tools: {tools}")
 
     return Agent(
         name="anonymous_support_information_agent",
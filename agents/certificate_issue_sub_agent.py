@@ -1,4 +1,5 @@
 # agents/certificate_issue_sub_agent.py - THREAD SAFE VERSION
+import asyncio
 import json
 import logging
 import os
@@ -6,12 +7,27 @@ import jwt
 import time
 from typing import List, Optional
 
-import httpx
+from dotenv import load_dotenv
 from google.adk.agents import Agent
 from opik import track
 from utils.request_context import RequestContext
+from utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
+load_dotenv()
+
+# Certificate API settings, read once at import
+KARMAYOGI_API_KEY = os.getenv('KARMAYOGI_API_KEY')
+COURSE_CERT_ISSUE_API = os.getenv('course_cert_issue_api')
+COURSE_CERT_ISSUE_URL = f"{os.getenv('lms_service_url')}{COURSE_CERT_ISSUE_API}"
+EVENT_CERT_ISSUE_URL = f"{os.getenv('lms_service_url')}{os.getenv('event_cert_issue_api')}"
+ACCESS_TOKEN_URL = f"{os.getenv('portal_endpoint', '')}{os.getenv('access_token_api', '')}"
+SYSTEM_ADMIN_USER = os.getenv('system_admin_user', '')
+SYSTEM_ADMIN_PASSWORD = os.getenv('system_admin_password', '@8887')
+
+# System admin token shared by certificate reissue calls; refreshed under the lock when expired
+user_token = None
+_user_token_lock = asyncio.Lock()
 
 
 def is_token_expired(token):
@@ -25,35 +41,40 @@ def is_token_expired(token):
         return True  # Treat decode errors as expired
 
 
-def get_user_token():
+async def get_user_token():
     """
     Generate a user token for authentication.
     This function should be called before any API requests that require authentication.
     """
     global user_token
     # if user_token is empty OR if user_token (jwt token) is expired, then generate new token
-    if not user_token or is_token_expired(user_token):
-        url = f"{os.getenv('portal_endpoint', '')}{os.getenv('access_token_api', '')}"
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        data = {
-            "client_id": "admin-cli",
-            "grant_type": "password",
-            "username": os.getenv('system_admin_user', ''),
-            "password": os.getenv('system_admin_password', '@8887')
-        }
-        try:
-            response = httpx.post(url, headers=headers, data=data, timeout=30.0)
-            if response.status_code == 200:
-                token_data = response.json()
-                user_token = token_data.get('access_token')
-                logger.info("User token generated successfully")
-            else:
-                logger.error(f"Failed to generate user token: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.error(f"Error generating user token: {e}")
-            raise e
+    if user_token and not is_token_expired(user_token):
+        return user_token
+
+    async with _user_token_lock:
+        # Another request may have refreshed the token while this one waited
+        if not user_token or is_token_expired(user_token):
+            url = ACCESS_TOKEN_URL
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+            data = {
+                "client_id": "admin-cli",
+                "grant_type": "password",
+                "username": SYSTEM_ADMIN_USER,
+                "password": SYSTEM_ADMIN_PASSWORD
+            }
+            try:
+                response = await get_http_client().post(url, headers=headers, data=data)
+                if response.status_code == 200:
+                    token_data = response.json()
+                    user_token = token_data.get('access_token')
+                    logger.info("User token generated successfully")
+                else:
+                    logger.error(f"Failed to generate user token: {response.status_code} - {response.text}")
+            except Exception as e:
+                logger.error(f"Error generating user token: {e}")
+                raise e
 
     return user_token
 
@@ -471,36 +492,13 @@ async def _get_user_course_enrollments_fallback(user_id: str, user_context: dict
 
     # Fallback to API call if not in context
     try:
-        # Use the existing service configuration
-        url = f"{os.getenv('learning_service_url')}{os.getenv('private_course_enrol_list_api')}{user_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {os.getenv('KARMAYOGI_API_KEY')}"
-        }
-
-        request_body = {
-            "request": {
-                "retiredCoursesEnabled": True,
-                "status": ["In-Progress", "Completed"]
-            }
-        }
+        # Reuse the user details service so the endpoint, headers and body stay in one place
+        from utils.userDetails import service, clean_course_enrollment_data
+        _, enrollments = await service._fetch_course_enrollments(user_id)
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json=request_body)
-
-            if response.status_code == 200:
-                data = response.json()
-                enrollments_result = data.get("result", {})
-                enrollments = enrollments_result.get("courses", [])
-
-                # Clean and return the enrollments
-                from utils.userDetails import clean_course_enrollment_data
-                cleaned_enrollments = clean_course_enrollment_data(enrollments)
-                logger.info(f"Retrieved {len(cleaned_enrollments)} course enrollments from API")
-                return cleaned_enrollments
-            else:
-                logger.error(f"Course enrollment API failed with status {response.status_code}")
-                return []
+        cleaned_enrollments = clean_course_enrollment_data(enrollments)
+        logger.info(f"Retrieved {len(cleaned_enrollments)} course enrollments from API")
+        return cleaned_enrollments
 
     except Exception as e:
         logger.error(f"Error fetching course enrollments from API: {e}")
@@ -575,23 +573,32 @@ async def _find_matching_course_fallback(user_id: str, course_name: str, user_co
             logger.warning("No course enrollments found for matching")
             return None
 
-        course_name_lower = course_name.lower()
+        course_name_lower = course_name.lower().strip()
 
-        # Try exact match first
-        for course in course_enrollments:
-            if course.get('course_name', '').lower() == course_name_lower:
-                logger.info(f"Found exact match: {course['course_name']}")
-                return course
+        # Lower-case each title once; untitled courses can't match a name
+        titled_courses = [
+            ((course.get('course_name') or '').lower(), course) for course in course_enrollments
+        ]
+        titled_courses = [(title, course) for title, course in titled_courses if title]
+
+        # Try exact match first (the first enrollment wins for duplicate titles)
+        courses_by_name = {}
+        for title, course in titled_courses:
+            courses_by_name.setdefault(title, course)
+        exact_match = courses_by_name.get(course_name_lower)
+        if exact_match is not None:
+            logger.info(f"Found exact match: {exact_match['course_name']}")
+            return exact_match
 
         # Try partial match (course name contains search term)
-        for course in course_enrollments:
-            if course_name_lower in course.get('course_name', '').lower():
+        for title, course in titled_courses:
+            if course_name_lower in title:
                 logger.info(f"Found partial match: {course['course_name']}")
                 return course
 
         # Try reverse partial match (search term contains course name)
-        for course in course_enrollments:
-            if course.get('course_name', '').lower() in course_name_lower:
+        for title, course in titled_courses:
+            if title in course_name_lower:
                 logger.info(f"Found reverse partial match: {course['course_name']}")
                 return course
 
@@ -600,11 +607,10 @@ async def _find_matching_course_fallback(user_id: str, course_name: str, user_co
         best_match = None
         best_score = 0
 
-        for course in course_enrollments:
-            course_title = course.get('course_name', '').lower()
+        for title, course in titled_courses:
             score = 0
             for word in search_words:
-                if len(word) > 2 and word in course_title:  # Only count words longer than 2 chars
+                if len(word) > 2 and word in title:  # Only count words longer than 2 chars
                     score += 1
 
             # If this course matches more words than the current best match
@@ -630,7 +636,7 @@ async def _call_certificate_issue_api(user_id: str, course_data: dict) -> bool:
     """
     try:
         # Use the existing service configuration
-        if not os.getenv('course_cert_issue_api') or not os.getenv('KARMAYOGI_API_KEY'):
+        if not COURSE_CERT_ISSUE_API or not KARMAYOGI_API_KEY:
             logger.warning("Certificate issue API not configured")
             return False
 
@@ -640,11 +646,11 @@ async def _call_certificate_issue_api(user_id: str, course_data: dict) -> bool:
         logger.debug(f"_call_certificate_issue_api :: course_id: {course_id}, course_type: {course_type}, batch_id: {batch_id}")
 
         if batch_id is not None and course_id is not None and course_type is not None and course_type.lower() == 'course':
-            url = f"{os.getenv('lms_service_url')}{os.getenv('course_cert_issue_api')}"
+            url = COURSE_CERT_ISSUE_URL
             headers = {
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {os.getenv('KARMAYOGI_API_KEY')}",
-                "x-authenticated-user-token": f"{get_user_token()}"
+                "Authorization": f"Bearer {KARMAYOGI_API_KEY}",
+                "x-authenticated-user-token": f"{await get_user_token()}"
             }
 
             request_body = {
@@ -656,11 +662,11 @@ async def _call_certificate_issue_api(user_id: str, course_data: dict) -> bool:
                 }
             }
         elif batch_id is not None and course_id is not None and course_type is not None and course_type.lower() == 'event':
-            url = f"{os.getenv('lms_service_url')}{os.getenv('event_cert_issue_api')}"
+            url = EVENT_CERT_ISSUE_URL
             headers = {
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {os.getenv('KARMAYOGI_API_KEY')}",
-                "x-authenticated-user-token": f"{get_user_token()}"
+                "Authorization": f"Bearer {KARMAYOGI_API_KEY}",
+                "x-authenticated-user-token": f"{await get_user_token()}"
             }
 
             request_body = {
@@ -675,15 +681,15 @@ async def _call_certificate_issue_api(user_id: str, course_data: dict) -> bool:
             logger.error("Invalid course data provided for certificate issue API")
             return False
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json=request_body)
+        client = get_http_client()
+        response = await client.post(url, headers=headers, json=request_body)
 
-            if response.status_code == 200:
-                logger.info(f"Certificate reissue successful for user {user_id}, course {course_id}")
-                return True
-            else:
-                logger.error(f"Certificate issue API failed with status {response.status_code}")
-                return False
+        if response.status_code == 200:
+            logger.info(f"Certificate reissue successful for user {user_id}, course {course_id}")
+            return True
+        else:
+            logger.error(f"Certificate issue API failed with status {response.status_code}")
+            return False
 
     except Exception as e:
         logger.error(f"Error calling certificate issue API: {e}")
@@ -11,44 +11,14 @@ from agents.user_profile_update_sub_agent import create_user_profile_update_sub_
 from agents.certificate_issue_sub_agent import create_certificate_issue_sub_agent
 from agents.ticket_management_sub_agent import create_ticket_management_sub_agent
 from agents.generic_sub_agent import create_generic_sub_agent
+from utils.adk_sessions import release_adk_session
 from utils.redis_session_service import ChatMessage
 from utils.request_context import RequestContext
 
 logger = logging.getLogger(__name__)
 
-
-class KarmayogiCustomerAgent:
-    """Custom agent that routes queries to appropriate sub-agents with thread-safe context"""
-
-    def __init__(self, opik_tracer, request_context: RequestContext):
-        self.opik_tracer = opik_tracer
-        self.request_context = request_context  # Use request context instead of separate params
-        self.current_session_id = None
-
-        # Initialize all sub-agents (will be created with context when needed)
-        self.user_profile_info_agent = None
-        self.user_profile_update_agent = None
-        self.certificate_issue_agent = None
-        self.ticket_management_agent = None
-        self.generic_agent = None
-
-        # Build chat history context for LLM
-        history_context = ""
-        chat_history = request_context.chat_history or []
-        if chat_history:
-            history_context = "\n\nRECENT CONVERSATION HISTORY:\n"
-            for msg in chat_history[-6:]:
-                role = "User" if msg.role == "user" else "Assistant"
-                content = msg.content[:200] + "..." if len(msg.content) > 200 else msg.content
-                history_context += f"{role}: {content}\n"
-
-        # Enhanced classification agent
-        self.classifier_agent = Agent(
-            name="karmayogi_intent_classifier",
-            model="gemini-2.0-flash-001",
-            description="Advanced intent classification agent with conversation context",
-            # ... instruction remains the same
-            instruction=f"""
+# Classification instruction for logged-in users; recent history is sent in the classification message
+CLASSIFIER_INSTRUCTION = """
 You are an advanced intent classifier for Karmayogi Bharat platform queries.
 
 CLASSIFICATION RULES:
@@ -140,11 +110,31 @@ General Platform information (GENERAL_SUPPORT):
 - "What is the platform's policy on data privacy?" → GENERAL_SUPPORT (platform policy)
 
 
-## Chat History Context:
-{chat_history}
-
 Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, TICKET_CREATION, or GENERAL_SUPPORT
-""",
+"""
+
+
+class KarmayogiCustomerAgent:
+    """Custom agent that routes queries to appropriate sub-agents with thread-safe context"""
+
+    def __init__(self, opik_tracer, request_context: RequestContext):
+        self.opik_tracer = opik_tracer
+        self.request_context = request_context  # Use request context instead of separate params
+        self.current_session_id = None
+
+        # Sub-agents are created on first use by _get_sub_agent
+        self.user_profile_info_agent = None
+        self.user_profile_update_agent = None
+        self.certificate_issue_agent = None
+        self.ticket_management_agent = None
+        self.generic_agent = None
+
+        # Enhanced classification agent
+        self.classifier_agent = Agent(
+            name="karmayogi_intent_classifier",
+            model="gemini-2.0-flash-001",
+            description="Advanced intent classification agent with conversation context",
+            instruction=CLASSIFIER_INSTRUCTION,
             tools=[],
             before_agent_callback=opik_tracer.before_agent_callback,
             after_agent_callback=opik_tracer.after_agent_callback,
@@ -158,50 +148,42 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
         self.request_context.session_id = session_id  # Update context too
         logger.info(f"Set session ID in KarmayogiCustomerAgent: {session_id}")
 
-    def _initialize_sub_agents(self):
-        """Initialize sub-agents with current request context (THREAD-SAFE)"""
-        if not self.user_profile_info_agent:
-            self.user_profile_info_agent = create_user_profile_info_sub_agent(
-                self.opik_tracer,
-                self.request_context  # Pass entire context
-            )
-
-        if not self.user_profile_update_agent:
-            self.user_profile_update_agent = create_user_profile_update_sub_agent(
-                self.opik_tracer,
-                self.request_context
-            )
-
-        if not self.certificate_issue_agent:
-            self.certificate_issue_agent = create_certificate_issue_sub_agent(
-                self.opik_tracer,
-                self.request_context
-            )
-
-        if not self.ticket_management_agent:
-            self.ticket_creation_agent = create_ticket_management_sub_agent(
-                self.opik_tracer,
-                self.request_context
-            )
-
-        if not self.generic_agent:
-            self.generic_agent = create_generic_sub_agent(
-                self.opik_tracer,
-                self.request_context
-            )
+    # Intent -> (attribute, factory). Sub-agents bind the request context, so only the routed one is built
+    _SUB_AGENT_FACTORIES = {
+        "USER_PROFILE_INFO": ("user_profile_info_agent", create_user_profile_info_sub_agent),
+        "USER_PROFILE_UPDATE": ("user_profile_update_agent", create_user_profile_update_sub_agent),
+        "CERTIFICATE_ISSUES": ("certificate_issue_agent", create_certificate_issue_sub_agent),
+        "TICKET_CREATION": ("ticket_management_agent", create_ticket_management_sub_agent),
+        "GENERAL_SUPPORT": ("generic_agent", create_generic_sub_agent),
+    }
+
+    def _get_sub_agent(self, intent: str) -> Agent:
+        """Create the sub-agent for an intent on first use (THREAD-SAFE)"""
+        attr, factory = self._SUB_AGENT_FACTORIES[intent]
+        agent = getattr(self, attr)
+        if agent is None:
+            agent = factory(self.opik_tracer, self.request_context)
+            setattr(self, attr, agent)
+        return agent
 
     async def route_query(self, user_message: str, session_service, session_id: str, user_id: str,
                           request_context: RequestContext) -> str:
         """Enhanced routing with thread-safe context"""
+        try:
+            return await self._route_query(user_message, session_service, session_id, user_id, request_context)
+        finally:
+            # The ADK session service is shared across requests, so drop this request's sessions
+            await release_adk_session(session_service, "karmayogi_intent_classifier", user_id, f"intent_{session_id}")
+
+    async def _route_query(self, user_message: str, session_service, session_id: str, user_id: str,
+                           request_context: RequestContext) -> str:
+        """Classify intent and dispatch to the matching sub-agent"""
 
         # Update the request context (ensure thread safety)
         self.request_context = request_context
 
         logger.info(f"Routing query with {len(request_context.chat_history or [])} history messages")
 
-        # Initialize sub-agents now that we have session context
-        self._initialize_sub_agents()
-
         # Build comprehensive context for classification
         classification_context = await self._build_classification_context(
             request_context.get_processing_message(),
@@ -248,7 +230,7 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
             if "USER_PROFILE_INFO" in intent_classification.upper():
                 logger.info("Routing to user profile info sub-agent")
                 return await self._run_sub_agent(
-                    self.user_profile_info_agent,
+                    self._get_sub_agent("USER_PROFILE_INFO"),
                     request_context.get_processing_message(),
                     session_service,
                     f"profile_info_{session_id}",
@@ -258,7 +240,7 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
             elif "USER_PROFILE_UPDATE" in intent_classification.upper():
                 logger.info("Routing to user profile update sub-agent")
                 return await self._run_sub_agent(
-                    self.user_profile_update_agent,
+                    self._get_sub_agent("USER_PROFILE_UPDATE"),
                     request_context.get_processing_message(),
                     session_service,
                     f"profile_update_{session_id}",
@@ -268,7 +250,7 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
             elif "CERTIFICATE_ISSUES" in intent_classification.upper():
                 logger.info("Routing to certificate issue sub-agent")
                 return await self._run_sub_agent(
-                    self.certificate_issue_agent,
+                    self._get_sub_agent("CERTIFICATE_ISSUES"),
                     request_context.get_processing_message(),
                     session_service,
                     f"certificate_issue_{session_id}",
@@ -278,7 +260,7 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
             elif "TICKET_CREATION" in intent_classification.upper():
                 logger.info("Routing to ticket creation sub-agent")
                 return await self._run_sub_agent(
-                    self.ticket_creation_agent,
+                    self._get_sub_agent("TICKET_CREATION"),
                     request_context.get_processing_message(),
                     session_service,
                     f"ticket_creation_{session_id}",
@@ -288,7 +270,7 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
             else:
                 logger.info("Routing to generic sub-agent")
                 return await self._run_sub_agent(
-                    self.generic_agent,
+                    self._get_sub_agent("GENERAL_SUPPORT"),
                     request_context.get_processing_message(),
                     session_service,
                     f"generic_{session_id}",
@@ -361,6 +343,16 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
     async def _run_sub_agent(self, agent: Agent, user_message: str, session_service, session_id: str,
                              user_id: str, request_context: RequestContext) -> str:
         """Run a sub-agent and return the response (THREAD-SAFE)"""
+        try:
+            return await self._run_sub_agent_session(
+                agent, user_message, session_service, session_id, user_id, request_context
+            )
+        finally:
+            await release_adk_session(session_service, f"karmayogi_{agent.name}", user_id, session_id)
+
+    async def _run_sub_agent_session(self, agent: Agent, user_message: str, session_service, session_id: str,
+                                     user_id: str, request_context: RequestContext) -> str:
+        """Create the sub-agent session, run the agent and collect its text response"""
 
         logger.info(f"Running {agent.name} with {len(request_context.chat_history or [])} history messages")
 
@@ -497,26 +489,26 @@ Respond with only: USER_PROFILE_INFO, USER_PROFILE_UPDATE, CERTIFICATE_ISSUES, T
         # Similar routing logic as in the main try block
         if route_decision == "USER_PROFILE_INFO":
             return await self._run_sub_agent(
-                self.user_profile_info_agent, user_message, session_service,
+                self._get_sub_agent("USER_PROFILE_INFO"), user_message, session_service,
                 f"profile_info_{session_id}", user_id, request_context
             )
         elif route_decision == "USER_PROFILE_UPDATE":
             return await self._run_sub_agent(
-                self.user_profile_update_agent, user_message, session_service,
+                self._get_sub_agent("USER_PROFILE_UPDATE"), user_message, session_service,
                 f"profile_update_{session_id}", user_id, request_context
             )
         elif route_decision == "CERTIFICATE_ISSUES":
             return await self._run_sub_agent(
-                self.certificate_issue_agent, user_message, session_service,
+                self._get_sub_agent("CERTIFICATE_ISSUES"), user_message, session_service,
                 f"certificate_issue_{session_id}", user_id, request_context
             )
         elif route_decision == "TICKET_CREATION":
             return await self._run_sub_agent(
-                self.ticket_creation_agent, user_message, session_service,
+                self._get_sub_agent("TICKET_CREATION"), user_message, session_service,
                 f"ticket_creation_{session_id}", user_id, request_context
             )
         else:
             return await self._run_sub_agent(
-                self.generic_agent, user_message, session_service,
+                self._get_sub_agent("GENERAL_SUPPORT"), user_message, session_service,
                 f"generic_{session_id}", user_id, request_context
             )
\ No newline at end of file
@@ -3,6 +3,7 @@ import logging
 from google.adk.agents import Agent
 from opik import track
 from utils.request_context import RequestContext
+from utils.semantic_cache import semantic_response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,8 @@ async def general_platform_support_tool_with_context(user_message: str, request_
         user_context = request_context.user_context or {}
 
         # Import functions locally to avoid global state issues
-        from utils.common_utils import (rephrase_query_with_history, call_gemini_api, call_local_llm, EMBEDDING_MODEL_NAME)
+        from utils.common_utils import (rephrase_query_with_history, call_gemini_api, call_local_llm, EMBEDDING_MODEL_NAME,
+                                        query_embedding_batcher, search_knowledge_base)
 
         # Build chat history context
         history_context = ""
@@ -39,15 +41,40 @@ async def general_platform_support_tool_with_context(user_message: str, request_
             rephrased_query = user_message
         logger.debug(f"Rephrased User message for general_platform_support_tool tool: {rephrased_query}")
 
-        # Step 2: Query Qdrant with SentenceTransformer embeddings
-        logger.info(f"Querying Qdrant with SentenceTransformer for: {rephrased_query}")
-        qdrant_results = await query_qdrant_with_sentence_transformer(rephrased_query, limit=5, threshold=0.6)
-
-        # Step 3: Build enhanced context from Qdrant results
         user_name = "Guest"
         if user_context and not request_context.is_anonymous:
             user_name = user_context.get('profile', {}).get('firstName', 'User')
 
+        # Step 2: Embed the query once; it drives the Qdrant search and keys the answer cache
+        try:
+            query_vector = await query_embedding_batcher.embed(rephrased_query)
+        except Exception as e:
+            logger.error(f"Error embedding query for knowledge base search: {e}")
+            query_vector = None
+
+        # Without conversation history the answer depends only on the query and the user's name
+        cacheable = query_vector is not None and not current_chat_history
+        if cacheable:
+            cached_response = await semantic_response_cache.get(user_name, query_vector)
+            if cached_response:
+                logger.info("Answered general support query from semantic cache")
+                return {
+                    "success": True,
+                    "response": cached_response,
+                    "query_type": "general_support_semantic_cache",
+                    "original_query": user_message,
+                    "rephrased_query": rephrased_query,
+                    "used_chat_history": False,
+                    "embedding_model": EMBEDDING_MODEL_NAME
+                }
+
+        logger.info(f"Querying Qdrant with SentenceTransformer for: {rephrased_query}")
+        qdrant_results = await search_knowledge_base(
+            rephrased_query, limit=5, threshold=0.6, query_vector=query_vector
+        )
+
+        # Step 3: Build enhanced context from Qdrant results
+
         knowledge_context = f"User's name: {user_name}\n\n"
 
         if qdrant_results:
@@ -92,6 +119,11 @@ Provide a comprehensive, helpful response based on all available information WIT
         logger.debug(f"general_platform_support_tool: system_message: {system_message}")
         response = await call_gemini_api(system_message)
 
+        # Only grounded Gemini answers are cached; degraded ones (no knowledge base hits,
+        # local LLM or canned fallbacks) must not be replayed to every paraphrase
+        if response and cacheable and qdrant_results:
+            await semantic_response_cache.put(user_name, query_vector, response)
+
         # Fallback to local LLM if Gemini fails
         if not response:
             logger.warning("Gemini API failed, falling back to local LLM")
@@ -150,84 +182,6 @@ async def general_platform_support_tool(user_message: str) -> dict:
     return {"success": False, "error": "Context required for thread safety"}
 
 
-async def query_qdrant_with_sentence_transformer(query: str, limit: int = 5, threshold: float = 0.6):
-    """Query Qdrant using SentenceTransformer embeddings"""
-    try:
-        from utils.common_utils import generate_embeddings, qdrant_client
-
-        query_embeddings = await generate_embeddings([query])
-        query_vector = query_embeddings[0]
-
-        if not isinstance(query_vector, list) or not all(isinstance(x, (int, float)) for x in query_vector):
-            logger.error(f"Invalid query_vector format: {type(query_vector)}")
-            raise ValueError("Query vector must be a flat list of floats")
-
-        search_result = qdrant_client.search(
-            collection_name="igot_docs",
-            query_vector=query_vector,
-            limit=limit,
-            score_threshold=threshold
-        )
-
-        results = []
-        for point in search_result:
-            result = {
-                "id": point.id,
-                "score": point.score,
-                "title": point.payload.get("title", "Untitled"),
-                "content": point.payload.get("content", ""),
-                "category": point.payload.get("category", "General"),
-                "tags": point.payload.get("tags", []),
-                **point.payload
-            }
-            results.append(result)
-
-        logger.info(f"SentenceTransformer search returned {len(results)} results")
-        return results
-
-    except Exception as e:
-        logger.error(f"Error querying Qdrant with SentenceTransformer: {e}")
-        return await fallback_text_search(query, limit)
-
-
-async def fallback_text_search(query: str, limit: int = 5):
-    """Fallback text-based search when semantic search fails"""
-    try:
-        from main import qdrant_client
-        from qdrant_client import models
-
-        search_result, _ = qdrant_client.scroll(
-            collection_name="igot_docs",
-            scroll_filter=models.Filter(
-                should=[
-                    models.FieldCondition(key="content", match=models.MatchText(text=query)),
-                    models.FieldCondition(key="title", match=models.MatchText(text=query))
-                ]
-            ),
-            limit=limit
-        )
-
-        results = []
-        for point in search_result:
-            result = {
-                "id": point.id,
-                "score": 0.5,
-                "title": point.payload.get("title", "Untitled"),
-                "content": point.payload.get("content", ""),
-                "category": point.payload.get("category", "General"),
-                "tags": point.payload.get("tags", []),
-                **point.payload
-            }
-            results.append(result)
-
-        logger.info(f"Fallback text search returned {len(results)} results")
-        return results
-
-    except Exception as e:
-        logger.error(f"Fallback text search also failed: {e}")
-        return []
-
-
 def create_generic_sub_agent(opik_tracer, request_context: RequestContext) -> Agent:
     """Create the generic sub-agent with request context (THREAD-SAFE)"""
 
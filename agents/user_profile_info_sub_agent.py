@@ -1,12 +1,29 @@
-import json
 import logging
 from typing import List
 from google.adk.agents import Agent
 from opik import track
+from utils.common_utils import to_prompt_json
 from utils.request_context import RequestContext
 
 logger = logging.getLogger(__name__)
 
+# Enrollment fields the LLM needs to answer questions; identifiers and batch ids only cost tokens
+_COURSE_PROMPT_FIELDS = (
+    'course_name', 'course_completion_status', 'course_completion_percentage',
+    'course_completed_content_count', 'course_total_content_count', 'course_enrolment_date',
+    'course_last_accessed_on', 'course_issued_certificate_id', 'course_certificate_issued_on'
+)
+_EVENT_PROMPT_FIELDS = (
+    'event_name', 'event_completion_status', 'event_completion_percentage',
+    'event_consumption_time_in_minutes', 'event_start_time', 'event_end_time', 'event_enrolment_date',
+    'event_last_accessed_on', 'event_issued_certificate_id', 'event_certificate_issued_on'
+)
+
+
+def _project(records: List[dict], fields: tuple) -> List[dict]:
+    """Keep only the given fields of each record"""
+    return [{k: r[k] for k in fields if k in r} for r in records]
+
 
 @track(name="postgresql_enrollment_search_tool")
 async def postgresql_enrollment_search_tool(user_message: str, request_context: RequestContext = None) -> dict:
@@ -78,17 +95,17 @@ The user's enrollment data contains:
 
 ### Course Enrollments:
 ```json
-{json.dumps(course_enrollments, indent=2)}
+{to_prompt_json(_project(course_enrollments, _COURSE_PROMPT_FIELDS))}
 ```
 
 ### Event Enrollments:
 ```json
-{json.dumps(event_enrollments, indent=2)}
+{to_prompt_json(_project(event_enrollments, _EVENT_PROMPT_FIELDS))}
 ```
 
 ### Enrollment Summary:
 ```json
-{json.dumps(enrollment_summary, indent=2)}
+{to_prompt_json(enrollment_summary)}
 ```
 
 ### Summary Statistics:
@@ -213,12 +230,12 @@ You are a helpful support agent for Karmayogi Bharat, a learning platform. Your
 ## Data Provided
 ### Profile Data:
 ```json
-{json.dumps(profile_data, indent=2)}
+{to_prompt_json(profile_data)}
 ```
 
 ### Enrollment Summary:
 ```json
-{json.dumps(enrollment_summary, indent=2)}
+{to_prompt_json(enrollment_summary)}
 ```
 
 ### Chat History Context:
@@ -339,12 +356,12 @@ You are analyzing enrollment query results from PostgreSQL.
 
 ### Enrollment Summary:
 ```json
-{json.dumps(enrollment_summary, indent=2)}
+{to_prompt_json(enrollment_summary)}
 ```
 
 ## Query Results:
 ```json
-{json.dumps(results, indent=2, default=str)}
+{to_prompt_json(results)}
 ```
 
 Provide a clear, conversational response based on the data.
@@ -15,6 +15,19 @@ logger = logging.getLogger(__name__)
 
 OTP_EXPIRY_IN_MINUTES = os.getenv("OTP_EXPIRY_IN_MINUTES", "15")
 
+# Patterns used to pull values out of user messages, compiled once
+_OTP_RE = re.compile(r'\b\d{4,6}\b')
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_EMAIL_FULL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+_MOBILE_RE = re.compile(r'\b[6-9]\d{9}\b')
+_NAME_RES = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:change|update|set).*?(?:my\s+)?(?:name|firstname)\s+(?:from\s+[A-Za-z\s]+\s+)?to\s+([A-Za-z\s]+)',
+    r'(?:change|update|set).*?(?:name|firstname).*?to\s+([A-Za-z\s]+)',
+    r'my\s+(?:name|firstname)\s+to\s+([A-Za-z\s]+)',
+    r'name\s+to\s+([A-Za-z\s]+)'
+))
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\-\(\)]+')
+
 
 @track(name="profile_update_tool")
 async def profile_update_tool(user_message: str,
@@ -647,6 +660,14 @@ async def _handle_otp_generation(state: dict, user_id: str, current_mobile: str,
                     "step": "awaiting_email"
                 }
 
+            if not _is_valid_email(email_to_use):
+                return {
+                    "success": True,
+                    "response": f"❌ **Invalid Email Address**\n\n**{email_to_use}** doesn't look like a valid email address. Please check it and share the new email address again.",
+                    "data_type": "profile_update",
+                    "step": "awaiting_email"
+                }
+
             logger.info(f"Generating OTP for {update_type} update, phone: {email_to_use}")
 
             # Step 1: Send OTP to new email Id
@@ -1200,20 +1221,17 @@ def _extract_values_from_query(query: str) -> dict:
     }
 
     # Extract OTP code (4-6 digits)
-    otp_pattern = r'\b\d{4,6}\b'
-    otp_matches = re.findall(otp_pattern, query.strip())
+    otp_matches = _OTP_RE.findall(query.strip())
     if otp_matches:
         extracted['otp_code'] = otp_matches[-1]
 
     # Extract email addresses
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    email_matches = re.findall(email_pattern, query)
+    email_matches = _EMAIL_RE.findall(query)
     if email_matches:
         extracted['email'] = email_matches[-1]
 
     # Extract mobile numbers (10 digits starting with 6-9)
-    mobile_pattern = r'\b[6-9]\d{9}\b'
-    mobile_matches = re.findall(mobile_pattern, query)
+    mobile_matches = _MOBILE_RE.findall(query)
 
     if mobile_matches:
         if len(mobile_matches) == 1:
@@ -1239,15 +1257,8 @@ def _extract_values_from_query(query: str) -> dict:
             extracted['mobile_number'] = mobile_matches[-1]
 
     # Extract names (improved pattern)
-    name_patterns = [
-        r'(?:change|update|set).*?(?:my\s+)?(?:name|firstname)\s+(?:from\s+[A-Za-z\s]+\s+)?to\s+([A-Za-z\s]+)',
-        r'(?:change|update|set).*?(?:name|firstname).*?to\s+([A-Za-z\s]+)',
-        r'my\s+(?:name|firstname)\s+to\s+([A-Za-z\s]+)',
-        r'name\s+to\s+([A-Za-z\s]+)'
-    ]
-
-    for pattern in name_patterns:
-        match = re.search(pattern, query, re.IGNORECASE)
+    for pattern in _NAME_RES:
+        match = pattern.search(query)
         if match:
             name = match.group(1).strip()
             # Clean up the name (remove extra words that might have been captured)
@@ -1296,6 +1307,11 @@ def _is_valid_mobile_number(mobile: str) -> bool:
     return True
 
 
+def _is_valid_email(email: str) -> bool:
+    """Validate email address format"""
+    return bool(email) and len(email) <= 254 and _EMAIL_FULL_RE.fullmatch(email) is not None
+
+
 def _validate_current_mobile_against_profile(provided_mobile: str, profile_mobile: str) -> bool:
     """Validate if the provided current mobile matches the profile mobile"""
     # Convert to string and check if both are valid
@@ -1306,8 +1322,8 @@ def _validate_current_mobile_against_profile(provided_mobile: str, profile_mobil
         return False
 
     # Clean both numbers (remove spaces, dashes, etc.)
-    provided_clean = re.sub(r'[\s\-\(\)]+', '', provided_str)
-    profile_clean = re.sub(r'[\s\-\(\)]+', '', profile_str)
+    provided_clean = _PHONE_SEPARATORS_RE.sub('', provided_str)
+    profile_clean = _PHONE_SEPARATORS_RE.sub('', profile_str)
 
     # Handle country code variations
     if provided_clean.startswith('+91'):
@@ -1,41 +1,46 @@
 # main.py - ADK Custom Agent with Intent-based Routing and Enhanced Logging
+import asyncio
+import functools
 import logging
 import os
 import re
 import time
+import uuid
 from contextlib import asynccontextmanager
-from copy import deepcopy
-from datetime import datetime
-from typing import Optional
+from dataclasses import dataclass
+from typing import Annotated, Final, Optional
 
 import opik
+import orjson
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from google.adk.sessions import InMemorySessionService
 from opik.integrations.adk import OpikTracer
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from agents.anonymous_customer_agent_router import AnonymousKarmayogiCustomerAgent
 from agents.custom_agent_router import KarmayogiCustomerAgent
-from utils.common_utils import get_embedding_model
+from utils.common_utils import get_embedding_model, get_qdrant_client
 from utils.contentCache import get_cached_user_details, hash_cookie
 from utils.postgresql_enrollment_service import initialize_user_enrollments_in_postgresql, postgresql_service
-from utils.translation_service import get_translation_context, translate_response_to_user_language, TranslationService
+from utils.translation_service import get_translation_context, translate_response_to_user_language, translation_service
 from utils.redis_connection_manager import (
     get_redis_manager,
     cleanup_redis_connections,
     redis_health_check
 )
 from utils.redis_session_service import (
-    redis_session_service,
     get_or_create_session,
     add_chat_message,
-    update_session_data,
+    finalize_chat_turn,
 )
 from utils.request_context import RequestContext
+from utils.http_client import close_http_client
 from utils.userDetails import UserDetailsError
 
 # Import the new logging configuration
@@ -46,7 +51,9 @@ from utils.logging_config import (
     log_agent_activity,
     LogExecutionTime,
     setup_development_logging,
-    setup_production_logging
+    setup_production_logging,
+    start_access_log_listener,
+    stop_access_log_listener
 )
 
 load_dotenv()
@@ -65,45 +72,117 @@ else:
 logger = logging.getLogger(__name__)
 access_logger = get_access_logger()
 
-# OPIK URL
-# opik.configure(
-#     url=os.getenv("OPIK_API_URL"),
-#     api_key=os.getenv("OPIK_API_KEY"),
-#     workspace=os.getenv("OPIK_WORKSPACE", "default"),
-#     use_local=False
-# )
-
-# OPIK LOCAL - enable this for SERVER
-opik.configure(
-    url=os.getenv("OPIK_API_URL"),
-    use_local=True
+# Static response strings shared by the chat endpoints
+_START_MSG: Final = "Starting new chat session."
+_FALLBACK: Final = "I apologize, but I didn't receive a proper response. Please try again."
+_ERR_PREFIX: Final = "Internal server error: "
+
+# Anonymous user_id detection
+_ANON_EXPLICIT: Final = frozenset({"anonymous", "guest", "", "null", "undefined"})
+_ANON_UID_RE: Final = re.compile(
+    r'^anonymous-[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}-\d+$',
+    re.IGNORECASE
 )
+_ANON_UID_PARSE: Final = re.compile(r'^anonymous-([a-f0-9-]{36})-(\d+)$', re.IGNORECASE)
+_ANON_COOKIE_PARSE: Final = re.compile(r'^non-logged-in-user-(?:anonymous-)?([a-f0-9-]{36})-(\d+)$', re.IGNORECASE)
+
+# Static guest profile shared by every anonymous request context
+_ANON_CTX_TEMPLATE: Final = {
+    'profile': {
+        'firstName': 'Guest',
+        'profileDetails': {
+            'personalDetails': {
+                'primaryEmail': '',
+                'mobile': ''
+            }
+        }
+    },
+    'course_enrollments': (),
+    'event_enrollments': (),
+    'enrollment_summary': {
+        'course_count': 0,
+        'event_count': 0,
+        'karma_points': 0
+    }
+}
+
+# Longest chat message accepted; oversized payloads get a 422 before reaching the agents
+MAX_MESSAGE_LENGTH: Final = 8192
+
+# The logged-in start reply is constant and cacheable; everything else is user-specific
+_START_HEADERS: Final = {"Cache-Control": "public, max-age=60", "ETag": '"start-v1"'}
+_NO_STORE_HEADERS: Final = {"Cache-Control": "no-store"}
+
+# Constant parts of the per-turn session metadata; request-specific fields are merged in
+_USER_MSG_META: Final = {"is_anonymous": False, "user_id_format": "logged_in"}
+_BOT_MSG_META: Final = {"is_anonymous": False}
+_TURN_CONTEXT: Final = {"is_anonymous": False, "user_type": "logged_in"}
+_ANON_USER_MSG_META: Final = {"user_id_format": "anonymous"}
+_ANON_TURN_CONTEXT: Final = {"user_type": "anonymous"}
+
+
+def _truncate(text: str, limit: int = 50) -> str:
+    """Cut text to limit characters, marking the cut with an ellipsis"""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+
+@functools.lru_cache(maxsize=4096)
+def _hash_cookie_cached(cookie: str) -> str:
+    """Memoized hash_cookie; cookies repeat across a user's consecutive messages"""
+    return hash_cookie(cookie)
+
+
+# /health snapshot shared by concurrent probes
+HEALTH_TTL: Final = float(os.getenv("HEALTH_TTL", "2.0"))
+_health_cache = {"body": None, "ts": 0.0}
+_health_lock = asyncio.Lock()
+
+_SKIP_LOG_PATHS: Final = frozenset({"/health", "/metrics", "/favicon.ico"})
+
+# Strong references to in-flight post-response session writes
+_background_tasks: set = set()
+
 
-opik_tracer = OpikTracer(project_name=os.getenv("OPIK_PROJECT"))
+def _on_background_task_done(task: asyncio.Task) -> None:
+    """Drop the finished task and log any failure"""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Background session write failed: {task.exception()}")
+
+
+def _schedule_session_write(coro) -> None:
+    """Run a session write after the response without blocking it"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
 
-translation_service = TranslationService()
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Middleware to log all HTTP requests"""
 
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        path = request.url.path
+        # Probe and asset endpoints are not worth an access-log line
+        if path in _SKIP_LOG_PATHS:
+            return await call_next(request)
+
+        start_time = time.perf_counter()
 
         # Extract user info from headers if available
         user_id = request.headers.get("user-id", "unknown")
 
         # Log request start
-        logger.debug(f"Request started: {request.method} {request.url.path}")
+        logger.debug(f"Request started: {request.method} {path}")
 
         response = await call_next(request)
 
         # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
+        duration_ms = (time.perf_counter() - start_time) * 1000
 
         # Log request completion
         log_request(
             method=request.method,
-            path=str(request.url.path),
+            path=path,
             status_code=response.status_code,
             duration_ms=duration_ms,
             user_id=user_id if user_id != "unknown" else None
@@ -114,24 +193,19 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
 
 class StartChat(BaseModel):
     """Model for starting a chat session."""
+    model_config = ConfigDict(frozen=True)
+
     channel_id: str
-    text: str | None = None
+    text: str | None = Field(default=None, max_length=MAX_MESSAGE_LENGTH)
     audio: Optional[str] = None
     language: Optional[str] = None
 
 
 class ChatRequest(BaseModel):
-    message: str
-    context: Optional[dict] = None
-
+    model_config = ConfigDict(frozen=True)
 
-class ChatResponse(BaseModel):
-    session_id: str
-    user_id: str
-    channel: str
-    message: str
-    response: str
-    timestamp: float
+    message: str = Field(max_length=MAX_MESSAGE_LENGTH)
+    context: Optional[dict] = None
 
 
 @asynccontextmanager
@@ -142,22 +216,55 @@ async def lifespan(app):
     logger.info(f"Environment: {ENVIRONMENT}")
     logger.info(f"Log Level: {LOG_LEVEL}")
 
-    try:
+    # Access-log lines are written to disk on a listener thread, off the event loop
+    start_access_log_listener()
+
+    async def _init_redis():
         with LogExecutionTime("Redis Manager Initialization", "startup"):
-            # ✅ Initialize shared Redis connection manager first
             logger.info("Initializing shared Redis connection manager...")
             redis_manager = await get_redis_manager()
-            redis_client = await redis_manager.get_redis_client()
+            app.state.redis = await redis_manager.get_redis_client()
             logger.info("✅ Shared Redis connection manager initialized successfully")
 
+    async def _init_postgres():
         with LogExecutionTime("PostgreSQL Initialization", "startup"):
             await postgresql_service.initialize_pool()
             logger.info("✅ PostgreSQL connection pool initialized")
 
+    async def _warm_embedding_model():
         with LogExecutionTime("Embedding Model Pre-warming", "startup"):
-            # Pre-warm embedding model
-            get_embedding_model()
-            logger.info("✅ Embedding model pre-warmed")
+            # Model load is blocking; run it in a thread so the other steps proceed
+            await asyncio.get_running_loop().run_in_executor(None, get_embedding_model)
+            get_qdrant_client()
+            logger.info("✅ Embedding model and Qdrant client pre-warmed")
+
+    try:
+        # Independent startup steps run concurrently; startup takes the slowest, not the sum
+        await asyncio.gather(_init_redis(), _init_postgres(), _warm_embedding_model(),
+                             translation_service.verify_api_key())
+
+        with LogExecutionTime("Opik Tracer Initialization", "startup"):
+            # OPIK URL
+            # opik.configure(
+            #     url=os.getenv("OPIK_API_URL"),
+            #     api_key=os.getenv("OPIK_API_KEY"),
+            #     workspace=os.getenv("OPIK_WORKSPACE", "default"),
+            #     use_local=False
+            # )
+
+            # OPIK LOCAL - enable this for SERVER
+            opik.configure(
+                url=os.getenv("OPIK_API_URL"),
+                use_local=True
+            )
+            app.state.opik_tracer = OpikTracer(project_name=os.getenv("OPIK_PROJECT"))
+            logger.info("✅ Opik tracer initialized")
+
+        # One ADK session store for all requests; routers delete their per-request sessions
+        app.state.adk_session_service = InMemorySessionService()
+
+        # Language detection is CPU-bound; keep it off the event loop
+        translation_service.start_detection_pool()
 
         logger.info("✅ Startup complete - Using optimized shared Redis connections")
 
@@ -170,6 +277,10 @@ async def lifespan(app):
     # ✅ OPTIMIZED SHUTDOWN
     logger.info("🛑 Shutting down with optimized cleanup...")
     try:
+        if _background_tasks:
+            # Let pending session writes land before Redis is closed
+            await asyncio.gather(*_background_tasks, return_exceptions=True)
+
         with LogExecutionTime("PostgreSQL Cleanup", "shutdown"):
             # Close PostgreSQL connections
             await postgresql_service.close()
@@ -180,9 +291,14 @@ async def lifespan(app):
             await cleanup_redis_connections()
             logger.info("✅ Shared Redis connections cleaned up")
 
+        await close_http_client()
+        translation_service.shutdown_detection_pool()
+        _hash_cookie_cached.cache_clear()
+
     except Exception as e:
         logger.error(f"❌ Shutdown error: {e}", exc_info=True)
 
+    stop_access_log_listener()
     logger.info("✅ Shutdown complete")
 
 
@@ -192,22 +308,45 @@ app = FastAPI(
     description="API with custom agent routing to specialized sub-agents, chat history, and anonymous user support",
     version="5.6.0",  # Updated version
     docs_url=None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # Add middlewares
 app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["*"],
-)
+# Compress long LLM answers; small bodies are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# CORS is handled by the ingress unless explicit origins are configured
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+if CORS_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "OPTIONS"],
+        allow_headers=["*"],
+    )
 
 
 @app.get("/health")
 async def health():
-    """✅ OPTIMIZED: Health endpoint using shared Redis connection manager"""
+    """✅ OPTIMIZED: Health endpoint serving a snapshot refreshed at most every HEALTH_TTL seconds"""
+    now = time.monotonic()
+    if _health_cache["body"] is not None and now - _health_cache["ts"] < HEALTH_TTL:
+        return Response(content=_health_cache["body"], media_type="application/json")
+
+    async with _health_lock:
+        # Another probe may have refreshed the snapshot while we waited
+        now = time.monotonic()
+        if _health_cache["body"] is None or now - _health_cache["ts"] >= HEALTH_TTL:
+            _health_cache["body"] = orjson.dumps(await _build_health_status())
+            _health_cache["ts"] = now
+
+    return Response(content=_health_cache["body"], media_type="application/json")
+
+
+async def _build_health_status() -> dict:
+    """Probe Redis and PostgreSQL and assemble the health payload"""
     try:
         with LogExecutionTime("Health Check", "health"):
             # Use shared Redis health check
@@ -267,18 +406,22 @@ def _is_anonymous_user(user_id: str) -> bool:
         logger.debug("Empty user_id provided")
         return True
 
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
     # Check for explicit anonymous patterns
-    if user_id.lower() in ["anonymous", "guest", "", "null", "undefined"]:
-        logger.debug(f"Explicit anonymous user detected: {user_id}")
+    if user_id.lower() in _ANON_EXPLICIT:
+        if debug_enabled:
+            logger.debug(f"Explicit anonymous user detected: {user_id}")
         return True
 
     # Check for the specific anonymous format: 'anonymous-UUID-epoch'
-    anonymous_pattern = r'^anonymous-[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}-\d+$'
-    if re.match(anonymous_pattern, user_id, re.IGNORECASE):
-        logger.debug(f"Anonymous pattern matched for user_id: {user_id}")
+    if _ANON_UID_RE.match(user_id):
+        if debug_enabled:
+            logger.debug(f"Anonymous pattern matched for user_id: {user_id}")
         return True
 
-    logger.debug(f"User identified as logged-in: {user_id}")
+    if debug_enabled:
+        logger.debug(f"User identified as logged-in: {user_id}")
     return False
 
 
@@ -294,19 +437,15 @@ def _extract_anonymous_session_info(user_id: str, cookie: str) -> dict:
     }
 
     try:
-        # Extract UUID and epoch from user_id
-        if user_id and user_id.lower().startswith('anonymous-'):
-            parts = user_id.split('-')
-            if len(parts) >= 6:  # anonymous-UUID(5 parts)-epoch
-                session_info['session_uuid'] = '-'.join(parts[1:6])  # Reconstruct UUID
-                session_info['session_epoch'] = parts[6]
-
-        # Extract UUID and epoch from cookie
-        if cookie and cookie.lower().startswith('non-logged-in-user-'):
-            parts = cookie.split('-')
-            if len(parts) >= 7:  # non-logged-in-user-UUID(5 parts)-epoch
-                session_info['cookie_uuid'] = '-'.join(parts[3:8])  # Reconstruct UUID
-                session_info['cookie_epoch'] = parts[8]
+        # Extract UUID and epoch from user_id: anonymous-UUID-epoch
+        match = _ANON_UID_PARSE.match(user_id) if user_id else None
+        if match:
+            session_info['session_uuid'], session_info['session_epoch'] = match.groups()
+
+        # Extract UUID and epoch from cookie: non-logged-in-user-[anonymous-]UUID-epoch
+        match = _ANON_COOKIE_PARSE.match(cookie) if cookie else None
+        if match:
+            session_info['cookie_uuid'], session_info['cookie_epoch'] = match.groups()
 
         # Create a unique session identifier
         if session_info['session_uuid'] and session_info['session_epoch']:
@@ -317,58 +456,91 @@ def _extract_anonymous_session_info(user_id: str, cookie: str) -> dict:
     except Exception as e:
         logger.warning(f"Error parsing anonymous user headers: {e}")
         # Fallback to basic anonymous session
-        session_info['session_id'] = f"anon_fallback_{int(datetime.now().timestamp())}"
+        session_info['session_id'] = f"anon_fallback_{int(time.time())}"
 
     return session_info
 
 
 def _create_anonymous_user_context(session_info: dict = None) -> dict:
     """Create minimal context for anonymous users with session info"""
-    context = {
-        'profile': {
-            'firstName': 'Guest',
-            'profileDetails': {
-                'personalDetails': {
-                    'primaryEmail': '',
-                    'mobile': ''
-                }
-            }
-        },
-        'course_enrollments': [],
-        'event_enrollments': [],
-        'enrollment_summary': {
-            'course_count': 0,
-            'event_count': 0,
-            'karma_points': 0
-        },
-        'session_info': session_info or {}
-    }
-    logger.debug(f"Created anonymous user context with session info")
+    # Guest state is shared from the template; only session_info is per request
+    context = {**_ANON_CTX_TEMPLATE, 'session_info': session_info or {}}
+    logger.debug("Created anonymous user context with session info")
     return context
 
 
+UserIdHeader = Annotated[str, Header(description="User ID from header")]
+CookieHeader = Annotated[str, Header(description="Cookie from header")]
+ChannelHeader = Annotated[str, Header(description="Channel from header")]
+
+
+@dataclass(slots=True)
+class Identity:
+    """Caller identity resolved once per request from the user-id and cookie headers"""
+    user_id: str
+    cookie: str
+    cookie_hash: Optional[str]
+    is_anonymous: bool = False
+    session_info: Optional[dict] = None
+    format_error: Optional[str] = None
+
+
+def _resolve_anonymous_identity(user_id: str, cookie: str) -> Identity:
+    """Parse and validate anonymous user_id/cookie headers"""
+    session_info = _extract_anonymous_session_info(user_id, cookie)
+
+    format_error = None
+    if not user_id.lower().startswith('anonymous-'):
+        format_error = f"Anonymous user_id doesn't match expected format: {user_id}"
+    elif cookie and not cookie.lower().startswith('non-logged-in-user-'):
+        format_error = f"Anonymous cookie doesn't match expected format: {cookie}"
+
+    return Identity(
+        user_id=user_id,
+        cookie=cookie,
+        # Anonymous session ids are derived from the public user_id, not a secret, so use them as-is
+        cookie_hash=session_info['session_id'],
+        is_anonymous=_is_anonymous_user(user_id),
+        session_info=session_info,
+        format_error=format_error
+    )
+
+
+async def get_identity(user_id: UserIdHeader, cookie: CookieHeader) -> Identity:
+    """Identity of a logged-in user"""
+    return Identity(user_id=user_id, cookie=cookie, cookie_hash=_hash_cookie_cached(cookie))
+
+
+async def get_anonymous_identity(user_id: UserIdHeader, cookie: CookieHeader) -> Identity:
+    """Identity of an anonymous user that sends its own cookie header"""
+    return _resolve_anonymous_identity(user_id, cookie)
+
+
+async def get_anonymous_session_identity(user_id: UserIdHeader) -> Identity:
+    """Identity of an anonymous user whose cookie is derived from the user_id"""
+    return _resolve_anonymous_identity(user_id, f"non-logged-in-user-{user_id}")
+
+
 @app.post("/chat/start")
 async def start_chat(
         request: StartChat,
-        user_id: str = Header(..., description="User ID from header"),
-        cookie: str = Header(..., description="Cookie from header")
+        identity: Identity = Depends(get_identity)
 ):
     """Endpoint to start a new chat session."""
     try:
-        logger.info(f"Starting new chat session for user: {user_id}")
+        logger.info(f"Starting new chat session for user: {identity.user_id}")
 
         if not request.text:
             chat_text = "Hello"
         else:
             chat_text = request.text.strip()
 
-        chat_request = ChatRequest(message=chat_text or "Hello", context={})
-        return await chat(
-            chat_request,
-            "start",
-            user_id=user_id,
+        return await _do_chat(
+            chat_text or "Hello",
+            None,
             channel=request.channel_id,
-            cookie=cookie
+            mode="start",
+            identity=identity
         )
     except Exception as e:
         logger.error(f"Error starting chat session: {e}", exc_info=True)
@@ -378,23 +550,21 @@ async def start_chat(
 @app.post("/chat/send")
 async def continue_chat(
         request: StartChat,
-        user_id: str = Header(..., description="User ID from header"),
-        cookie: str = Header(..., description="Cookie from header")
+        identity: Identity = Depends(get_identity)
 ):
     """Endpoint to continue an existing chat session."""
     try:
-        logger.info(f"Continuing chat session for user: {user_id}")
+        logger.info(f"Continuing chat session for user: {identity.user_id}")
 
         if not request.text:
             raise HTTPException(status_code=400, detail="Message text cannot be empty")
 
-        chat_request = ChatRequest(message=request.text or "", context={})
-        return await chat(
-            chat_request,
-            "send",
-            user_id=user_id,
+        return await _do_chat(
+            request.text or "",
+            None,
             channel=request.channel_id,
-            cookie=cookie
+            mode="send",
+            identity=identity
         )
     except Exception as e:
         logger.error(f"Error continuing chat session: {e}", exc_info=True)
@@ -404,24 +574,23 @@ async def continue_chat(
 @app.post("/anonymous/chat/start")
 async def anonymous_start_chat(
         request: StartChat,
-        user_id: str = Header(..., description="User ID from header"),
+        identity: Identity = Depends(get_anonymous_session_identity)
 ):
     """Endpoint to start a new anonymous chat session."""
     try:
-        logger.info(f"Starting new anonymous chat session for user: {user_id}")
+        logger.info(f"Starting new anonymous chat session for user: {identity.user_id}")
 
         if not request.text:
             chat_text = "Hello"
         else:
             chat_text = request.text.strip()
 
-        chat_request = ChatRequest(message=chat_text or "Hello", context={})
-        return await anonymous_chat(
-            chat_request,
-            "start",
-            user_id=user_id,
+        return await _do_anonymous_chat(
+            chat_text or "Hello",
+            None,
             channel=request.channel_id,
-            cookie=f"non-logged-in-user-{user_id}"
+            mode="start",
+            identity=identity
         )
     except Exception as e:
         logger.error(f"Error starting anonymous chat session: {e}", exc_info=True)
@@ -431,22 +600,21 @@ async def anonymous_start_chat(
 @app.post("/anonymous/chat/send")
 async def anonymous_continue_chat(
         request: StartChat,
-        user_id: str = Header(..., description="User ID from header")
+        identity: Identity = Depends(get_anonymous_session_identity)
 ):
     """Endpoint to continue an existing anonymous chat session."""
     try:
-        logger.info(f"Continuing anonymous chat session for user: {user_id}")
+        logger.info(f"Continuing anonymous chat session for user: {identity.user_id}")
 
         if not request.text:
             raise HTTPException(status_code=400, detail="Message text cannot be empty")
 
-        chat_request = ChatRequest(message=request.text or "", context={})
-        return await anonymous_chat(
-            chat_request,
-            "send",
-            user_id=user_id,
+        return await _do_anonymous_chat(
+            request.text or "",
+            None,
             channel=request.channel_id,
-            cookie=f"non-logged-in-user-{user_id}"
+            mode="send",
+            identity=identity
         )
     except Exception as e:
         logger.error(f"Error continuing anonymous chat session: {e}", exc_info=True)
@@ -456,12 +624,25 @@ async def anonymous_continue_chat(
 @app.post("/anonymous/chat/direct")
 async def anonymous_chat(
         chat_request: ChatRequest,
+        channel: ChannelHeader,
         mode: Optional[str] = None,
-        user_id: str = Header(..., description="User ID from header"),
-        channel: str = Header(..., description="Channel from header"),
-        cookie: str = Header(..., description="Cookie from header")
+        identity: Identity = Depends(get_anonymous_identity)
 ):
     """Chat endpoint for anonymous users with enhanced logging."""
+    return await _do_anonymous_chat(chat_request.message, chat_request.context, channel, mode, identity)
+
+
+async def _do_anonymous_chat(
+        message: str,
+        request_context_data: Optional[dict],
+        channel: str,
+        mode: Optional[str],
+        identity: Identity
+):
+    """Anonymous chat pipeline shared by the direct endpoint and the start/send wrappers"""
+    now = time.time()
+    user_id = identity.user_id
+    cookie = identity.cookie
     audio_url = None
 
     try:
@@ -469,24 +650,21 @@ async def anonymous_chat(
 
             # Step 1: Get translation context FIRST
             with LogExecutionTime("Language Detection and Translation", "translation"):
-                translation_context = await get_translation_context(chat_request.message)
+                translation_context = await get_translation_context(message)
                 logger.info(f"Translation context: {translation_context['language_name']} -> English")
 
-            # Check if user is anonymous using the specific header format
-            is_anonymous = _is_anonymous_user(user_id)
-
-            # Extract session information for anonymous users
-            session_info = _extract_anonymous_session_info(user_id, cookie)
+            # Anonymous detection, session parsing and header validation ran once in the dependency
+            is_anonymous = identity.is_anonymous
+            session_info = identity.session_info
             logger.info(f"Anonymous user detected - Session ID: {session_info['session_id']}")
 
-            # Hash the cookie for secure storage (use session-specific hash for anonymous)
-            cookie_hash = hash_cookie(session_info['session_id'])
+            cookie_hash = identity.cookie_hash
 
             log_agent_activity(
                 agent_name="AnonymousKarmayogiCustomerAgent",
                 action="chat_start",
                 user_id=user_id,
-                details=f"Channel: {channel}, Message: {chat_request.message[:50]}..."
+                details=f"Channel: {channel}, Message: {_truncate(message)}"
             )
 
             # Validate required headers (relaxed for anonymous users)
@@ -496,14 +674,10 @@ async def anonymous_chat(
                     detail="Missing required header: channel"
                 )
 
-            # Validate anonymous user header formats
-            if not user_id.lower().startswith('anonymous-'):
-                logger.warning(f"Anonymous user_id doesn't match expected format: {user_id}")
-                return {"message": f"Anonymous user_id doesn't match expected format: {user_id}"}
-
-            if cookie and not cookie.lower().startswith('non-logged-in-user-'):
-                logger.warning(f"Anonymous cookie doesn't match expected format: {cookie}")
-                return {"message": f"Anonymous cookie doesn't match expected format: {cookie}"}
+            # Reject anonymous headers that failed format validation
+            if identity.format_error:
+                logger.warning(identity.format_error)
+                return {"message": identity.format_error}
 
             # Step 1: Get or create Redis session with proper session ID
             app_name = "karmayogi_bharat_support_bot"
@@ -522,12 +696,12 @@ async def anonymous_chat(
                         channel=channel,
                         cookie_hash=effective_cookie_hash,
                         initial_context={
-                            "last_user_message": chat_request.message,
-                            "request_context": chat_request.context or {},
+                            "last_user_message": message,
+                            "request_context": request_context_data or {},
                             "is_anonymous": is_anonymous,
                             "session_info": session_info,
                             "original_user_id": user_id,
-                            "original_cookie": cookie[:50] + "..." if len(cookie) > 50 else cookie
+                            "original_cookie": _truncate(cookie)
                         }
                     )
 
@@ -543,6 +717,13 @@ async def anonymous_chat(
                     detail=f"Session management failed: {str(session_error)}"
                 )
 
+            # Start requests only open the session; the greeting does not depend on the agent
+            if mode == "start":
+                return ORJSONResponse(
+                    {"message": f"Starting new anonymous chat session. Session ID: {session_info.get('session_uuid', 'Unknown')[:8]}..."},
+                    headers=_NO_STORE_HEADERS
+                )
+
             anonymous_user_context = None
 
             if is_anonymous:
@@ -551,23 +732,25 @@ async def anonymous_chat(
                 cached_user_details = None
 
             # Step 3: Get conversation history
-            try:
-                with LogExecutionTime("Conversation History Retrieval", "history"):
-                    logger.info("Fetching conversation history...")
-                    conversation_history = await redis_session_service.get_conversation_history(
-                        session.session_id, limit=6
-                    )
+            if is_new_session:
+                # A session created this turn has no history yet
+                conversation_history = ()
+            else:
+                try:
+                    with LogExecutionTime("Conversation History Retrieval", "history"):
+                        # The session was just loaded from Redis; read history from it instead of a second GET
+                        conversation_history = tuple(session.get_conversation_history(limit=6))
 
-                    logger.info(f"Retrieved {len(conversation_history)} messages from conversation history")
+                        logger.info(f"Retrieved {len(conversation_history)} messages from conversation history")
 
-                    if conversation_history:
-                        logger.debug("Recent conversation context:")
-                        for i, msg in enumerate(conversation_history[-4:]):
-                            logger.debug(f"  {i + 1}. {msg.role}: {msg.content[:100]}...")
+                        if conversation_history:
+                            logger.debug("Recent conversation context:")
+                            for i, msg in enumerate(conversation_history[-4:]):
+                                logger.debug(f"  {i + 1}. {msg.role}: {msg.content[:100]}...")
 
-            except Exception as history_error:
-                logger.warning(f"Failed to fetch conversation history: {history_error}")
-                conversation_history = []
+                except Exception as history_error:
+                    logger.warning(f"Failed to fetch conversation history: {history_error}")
+                    conversation_history = ()
 
             # Step 4: Create Request Context (THREAD-SAFE)
             request_context = RequestContext(
@@ -582,60 +765,38 @@ async def anonymous_chat(
             )
             request_context.set_translation_context(translation_context)
 
-            # Step 5: Add user message to session with enhanced metadata
-            user_message = await add_chat_message(
+            # Step 5: Add user message to session with enhanced metadata.
+            # The agent already has the message in the request context, so the write overlaps routing.
+            user_message_task = asyncio.create_task(add_chat_message(
                 session.session_id,
                 "user",
-                chat_request.message,
+                message,
                 {
-                    "timestamp": time.time(),
+                    **_ANON_USER_MSG_META,
+                    "timestamp": now,
                     "channel": channel,
                     "is_anonymous": is_anonymous,
                     "session_uuid": session_info.get('session_uuid'),
-                    "session_epoch": session_info.get('session_epoch'),
-                    "user_id_format": "anonymous"
+                    "session_epoch": session_info.get('session_epoch')
                 }
-            )
-
-            if not user_message:
-                logger.error("Failed to add user message to session")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to record user message"
-                )
+            ))
 
             # Step 6: Create custom agent and route query (PASS CONTEXT)
             logger.info("Creating custom agent for anonymous user...")
 
             # ✅ FIXED: Pass RequestContext instead of separate parameters
-            customer_agent = AnonymousKarmayogiCustomerAgent(opik_tracer, request_context)
+            customer_agent = AnonymousKarmayogiCustomerAgent(app.state.opik_tracer, request_context)
             customer_agent.set_session_id(session.session_id)
 
-            adk_session_service = InMemorySessionService()
-            adk_session_id = f"adk_{session.session_id}"
-
-            # Create ADK session with enhanced state
-            await adk_session_service.create_session(
-                app_name="karmayogi_custom_agent",
-                user_id=effective_user_id,
-                session_id=adk_session_id,
-                state={
-                    "redis_session_id": session.session_id,
-                    "conversation_history_count": len(conversation_history),
-                    "is_anonymous": is_anonymous,
-                    "session_info": session_info,
-                    "original_headers": {
-                        "user_id": user_id,
-                        "cookie": cookie[:50] + "..." if len(cookie) > 50 else cookie
-                    }
-                }
-            )
+            adk_session_service = app.state.adk_session_service
+            # Unique per request; the routers derive their ADK session ids from it
+            adk_session_id = f"adk_{session.session_id}_{uuid.uuid4().hex}"
 
             try:
                 with LogExecutionTime("Agent Query Processing", "agent"):
                     # ✅ FIXED: Route the query through the custom agent (PASS CONTEXT)
                     bot_response = await customer_agent.route_query(
-                        chat_request.message,
+                        message,
                         adk_session_service,
                         adk_session_id,
                         effective_user_id,
@@ -648,44 +809,50 @@ async def anonymous_chat(
                 logger.error(f"Error in custom agent routing: {e}", exc_info=True)
                 bot_response = f"I apologize, but I'm experiencing technical difficulties. As a guest user, I can help you learn about the Karmayogi platform and create support tickets. Please try your request again."
 
-            # Step 7: Add bot response to session with enhanced metadata
-            await add_chat_message(
+            # The user message must be stored before the reply is appended after it
+            if not await user_message_task:
+                logger.error("Failed to add user message to session")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to record user message"
+                )
+
+            replied_at = time.time()
+            history_len = len(conversation_history)
+            response_len = len(bot_response)
+            # Steps 7-8: Add bot response and update session context in one write, off the response path
+            _schedule_session_write(finalize_chat_turn(
                 session.session_id,
                 "assistant",
                 bot_response,
                 {
-                    "timestamp": time.time(),
-                    "used_history_messages": len(conversation_history),
+                    "timestamp": replied_at,
+                    "used_history_messages": history_len,
                     "is_anonymous": is_anonymous,
                     "session_uuid": session_info.get('session_uuid'),
-                    "response_length": len(bot_response)
-                }
-            )
-
-            # Step 8: Update session context with enhanced information
-            await update_session_data(
-                session.session_id,
+                    "response_length": response_len
+                },
                 context_updates={
-                    "last_interaction": time.time(),
+                    **_ANON_TURN_CONTEXT,
+                    "last_interaction": replied_at,
                     "detected_language": translation_context['detected_language'],
                     "language_name": translation_context['language_name'],
                     "translation_context": translation_context,
-                    "last_user_message": chat_request.message,
-                    "last_bot_response": bot_response[:100] + "..." if len(bot_response) > 100 else bot_response,
-                    "conversation_history_used": len(conversation_history),
+                    "last_user_message": message,
+                    "last_bot_response": _truncate(bot_response, 100),
+                    "conversation_history_used": history_len,
                     "total_conversation_messages": session.message_count + 2,
                     "is_anonymous": is_anonymous,
                     "session_uuid": session_info.get('session_uuid'),
-                    "session_epoch": session_info.get('session_epoch'),
-                    "user_type": "anonymous"
+                    "session_epoch": session_info.get('session_epoch')
                 }
-            )
+            ))
 
             log_agent_activity(
                 agent_name="AnonymousKarmayogiCustomerAgent",
                 action="chat_complete",
                 user_id=user_id,
-                details=f"Response length: {len(bot_response)}, Session: {session.session_id}"
+                details=f"Response length: {response_len}, Session: {session.session_id}"
             )
 
             # Enhanced logging with session information
@@ -693,16 +860,12 @@ async def anonymous_chat(
                 f"Anonymous session completed - Session UUID: {session_info.get('session_uuid', 'Unknown')[:8]}..., "
                 f"Redis ID: {session.session_id}, Total Messages: {session.message_count + 2}")
 
-            if mode is not None and mode == "start":
-                bot_response = f"Starting new anonymous chat session. Session ID: {session_info.get('session_uuid', 'Unknown')[:8]}..."
-                return {"message": bot_response}
+            if isinstance(bot_response, str):
+                bot_response = bot_response
+            elif hasattr(bot_response, 'response'):
+                bot_response = bot_response.response
             else:
-                if isinstance(bot_response, str):
-                    bot_response = bot_response
-                elif hasattr(bot_response, 'response'):
-                    bot_response = bot_response.response
-                else:
-                    bot_response = "I apologize, but I didn't receive a proper response. Please try again."
+                bot_response = _FALLBACK
 
             # Step 7: Translate response back to user's language
             if translation_context['needs_translation'] and bot_response:
@@ -716,7 +879,7 @@ async def anonymous_chat(
                 final_response = bot_response
 
             logger.debug(f"Returning response for anonymous user: {final_response[:100]}...")
-            return {"text": final_response, "audio": audio_url}
+            return ORJSONResponse({"text": final_response, "audio": audio_url}, headers=_NO_STORE_HEADERS)
 
     except HTTPException:
         raise
@@ -724,124 +887,155 @@ async def anonymous_chat(
         logger.error(f"Unexpected error in anonymous chat endpoint: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
-            detail=f"Internal server error: {str(e)}"
+            detail=_ERR_PREFIX + str(e)
         )
 
 
 @app.post("/chat/direct")
 async def chat(
         chat_request: ChatRequest,
+        channel: ChannelHeader,
         mode: Optional[str] = None,
-        user_id: str = Header(..., description="User ID from header"),
-        channel: str = Header(..., description="Channel from header"),
-        cookie: str = Header(..., description="Cookie from header")
+        identity: Identity = Depends(get_identity)
 ):
     """Chat endpoint with custom agent routing and enhanced logging."""
+    return await _do_chat(chat_request.message, chat_request.context, channel, mode, identity)
+
+
+async def _init_pg_enrollments(user_id: str, session_id: str, cached_user_details) -> None:
+    """Load the user's enrollments into PostgreSQL; failures are logged, never raised."""
+    try:
+        with LogExecutionTime("PostgreSQL Enrollment Initialization", "postgres"):
+            logger.info("Initializing PostgreSQL enrollments...")
+            await initialize_user_enrollments_in_postgresql(
+                user_id=user_id,
+                session_id=session_id,
+                course_enrollments=cached_user_details.course_enrollments,
+                event_enrollments=cached_user_details.event_enrollments,
+                snapshot=cached_user_details.cache_timestamp
+            )
+            logger.info("PostgreSQL enrollments initialized successfully")
+    except Exception as postgres_error:
+        logger.warning(f"Failed to initialize PostgreSQL enrollments: {postgres_error}")
+
+
+async def _do_chat(
+        message: str,
+        request_context_data: Optional[dict],
+        channel: str,
+        mode: Optional[str],
+        identity: Identity
+):
+    """Logged-in chat pipeline shared by the direct endpoint and the start/send wrappers"""
+    now = time.time()
+    user_id = identity.user_id
+    cookie = identity.cookie
+    # Hot-path names bound to locals once per request
+    _info = logger.info
+    _error = logger.error
+    _HTTPException = HTTPException
     audio_url = None
 
     try:
         with LogExecutionTime(f"Chat Processing - User: {user_id}", "chat"):
             # Step 1: Get translation context FIRST
             with LogExecutionTime("Language Detection and Translation", "translation"):
-                translation_context = await get_translation_context(chat_request.message)
-                logger.info(f"Translation context: {translation_context['language_name']} -> English")
+                translation_context = await get_translation_context(message)
+                _info(f"Translation context: {translation_context['language_name']} -> English")
 
             # Step 2: session management...
             session_info = {'is_anonymous': False}
-            cookie_hash = hash_cookie(cookie)
+            cookie_hash = identity.cookie_hash
 
             log_agent_activity(
                 agent_name="KarmayogiCustomerAgent",
                 action="chat_start",
                 user_id=user_id,
-                details=f"Channel: {channel}, Message: {chat_request.message[:50]}..."
+                details=f"Channel: {channel}, Message: {_truncate(message)}"
             )
 
             # Validate required headers
             if not channel:
-                raise HTTPException(status_code=400, detail="Missing required header: channel")
+                raise _HTTPException(status_code=400, detail="Missing required header: channel")
 
             # Step 1: Get or create Redis session
             app_name = "karmayogi_bharat_support_bot"
 
             try:
                 with LogExecutionTime("Redis Session Management", "session"):
-                    logger.info("Managing session with Redis...")
+                    _info("Managing session with Redis...")
                     session, is_new_session = await get_or_create_session(
                         app_name=app_name,
                         user_id=user_id,
                         channel=channel,
                         cookie_hash=cookie_hash,
                         initial_context={
-                            "last_user_message": chat_request.message,
+                            "last_user_message": message,
                             "detected_language": translation_context['detected_language'],
                             "language_name": translation_context['language_name'],
                             "translation_context": translation_context,
-                            "request_context": chat_request.context or {},
+                            "request_context": request_context_data or {},
                             "is_anonymous": False,
                             "session_info": session_info,
                             "original_user_id": user_id,
-                            "original_cookie": cookie[:50] + "..." if len(cookie) > 50 else cookie
+                            "original_cookie": _truncate(cookie)
                         }
                     )
 
-                    logger.info(f"Using Redis session: {session.session_id}")
+                    _info(f"Using Redis session: {session.session_id}")
 
             except Exception as session_error:
-                logger.error(f"Redis session management error: {session_error}", exc_info=True)
-                raise HTTPException(status_code=500, detail=f"Session management failed: {str(session_error)}")
+                _error(f"Redis session management error: {session_error}", exc_info=True)
+                raise _HTTPException(status_code=500, detail=f"Session management failed: {str(session_error)}")
 
             # Step 3: Get user context
             try:
                 with LogExecutionTime("User Authentication and Context Retrieval", "auth"):
-                    logger.info("Authenticating user and fetching details from cache...")
+                    _info("Authenticating user and fetching details from cache...")
                     cached_user_details, was_cached = await get_cached_user_details(
                         user_id, cookie, session_id=session.session_id
                     )
 
-                    user_context = deepcopy(cached_user_details.to_dict())
-                    user_context['session_info'] = session_info
+                    # to_dict() is memoized and its nested lists/dicts are shared with the cached
+                    # instance (and every request using it): add top-level keys only, never mutate values
+                    user_context = {**cached_user_details.to_dict(), 'session_info': session_info}
 
                     if was_cached:
-                        logger.info(
+                        _info(
                             f"Used cached user details. Enrollments: courses={cached_user_details.course_count}, events={cached_user_details.event_count}")
                     else:
-                        logger.info(
+                        _info(
                             f"Fetched fresh user details. Enrollments: courses={cached_user_details.course_count}, events={cached_user_details.event_count}")
 
             except UserDetailsError as e:
-                logger.error(f"User authentication failed: {e}")
-                raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
+                _error(f"User authentication failed: {e}")
+                raise _HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
             except Exception as e:
-                logger.error(f"Unexpected error during authentication: {e}", exc_info=True)
-                raise HTTPException(status_code=500, detail="Authentication service temporarily unavailable")
+                _error(f"Unexpected error during authentication: {e}", exc_info=True)
+                raise _HTTPException(status_code=500, detail="Authentication service temporarily unavailable")
 
-            try:
-                with LogExecutionTime("PostgreSQL Enrollment Initialization", "postgres"):
-                    logger.info("Initializing PostgreSQL enrollments...")
-                    await initialize_user_enrollments_in_postgresql(
-                        user_id=user_id,
-                        session_id=session.session_id,
-                        course_enrollments=cached_user_details.course_enrollments,
-                        event_enrollments=cached_user_details.event_enrollments
-                    )
-                    logger.info("PostgreSQL enrollments initialized successfully")
-            except Exception as postgres_error:
-                logger.warning(f"Failed to initialize PostgreSQL enrollments: {postgres_error}")
+            # Start requests only open the session and verify the user; the greeting does not depend on the agent
+            if mode == "start":
+                return ORJSONResponse({"message": _START_MSG}, headers=_START_HEADERS)
+
+            # Runs alongside steps 4-6; the sub-agents read these tables, so it is awaited before routing
+            pg_task = asyncio.create_task(_init_pg_enrollments(user_id, session.session_id, cached_user_details))
 
             # Step 4: Get conversation history
-            try:
-                with LogExecutionTime("Conversation History Retrieval", "history"):
-                    logger.info("Fetching conversation history...")
-                    conversation_history = await redis_session_service.get_conversation_history(
-                        session.session_id, limit=6
-                    )
+            if is_new_session:
+                # A session created this turn has no history yet
+                conversation_history = ()
+            else:
+                try:
+                    with LogExecutionTime("Conversation History Retrieval", "history"):
+                        # The session was just loaded from Redis; read history from it instead of a second GET
+                        conversation_history = tuple(session.get_conversation_history(limit=6))
 
-                    logger.info(f"Retrieved {len(conversation_history)} messages from conversation history")
+                        _info(f"Retrieved {len(conversation_history)} messages from conversation history")
 
-            except Exception as history_error:
-                logger.warning(f"Failed to fetch conversation history: {history_error}")
-                conversation_history = []
+                except Exception as history_error:
+                    logger.warning(f"Failed to fetch conversation history: {history_error}")
+                    conversation_history = ()
 
             # Step 5: Create Request Context (THREAD-SAFE)
             request_context = RequestContext(
@@ -856,54 +1050,39 @@ async def chat(
             )
             request_context.set_translation_context(translation_context)
 
-            # Step 6: Add user message to session
-            user_message = await add_chat_message(
+            # Step 6: Add user message to session.
+            # The agent already has the message in the request context, so the write overlaps routing.
+            user_message_task = asyncio.create_task(add_chat_message(
                 session.session_id,
                 "user",
-                chat_request.message,
+                message,
                 {
-                    "timestamp": time.time(),
+                    **_USER_MSG_META,
+                    "timestamp": now,
                     "channel": channel,
-                    "is_anonymous": False,
-                    "user_id_format": "logged_in",
                     "detected_language": translation_context['detected_language'],
                     "language_name": translation_context['language_name'],
                     "english_translation": translation_context['english_message'],
                     "needs_translation": translation_context['needs_translation']
                 }
-            )
+            ))
 
-            if not user_message:
-                logger.error("Failed to add user message to session")
-                raise HTTPException(status_code=500, detail="Failed to record user message")
+            await pg_task
 
             # Step 7: Create custom agent and route query (PASS CONTEXT)
-            logger.info("Creating custom agent...")
-            customer_agent = KarmayogiCustomerAgent(opik_tracer, request_context)
+            _info("Creating custom agent...")
+            customer_agent = KarmayogiCustomerAgent(app.state.opik_tracer, request_context)
             customer_agent.set_session_id(session.session_id)
 
-            adk_session_service = InMemorySessionService()
-            adk_session_id = f"adk_{session.session_id}"
-
-            await adk_session_service.create_session(
-                app_name="karmayogi_custom_agent",
-                user_id=user_id,
-                session_id=adk_session_id,
-                state={
-                    "redis_session_id": session.session_id,
-                    "conversation_history_count": len(conversation_history),
-                    "is_anonymous": False,
-                    "session_info": session_info,
-                    "detected_language": translation_context['detected_language'],
-                    "translation_context": translation_context
-                }
-            )
+            adk_session_service = app.state.adk_session_service
+            # Unique per request; the routers derive their ADK session ids from it
+            adk_session_id = f"adk_{session.session_id}_{uuid.uuid4().hex}"
 
             try:
                 with LogExecutionTime("Agent Query Processing", "agent"):
                     # Route the query through the custom agent (PASS CONTEXT)
                     bot_response = await customer_agent.route_query(
-                        chat_request.message,
+                        message,
                         adk_session_service,
                         adk_session_id,
                         user_id,
@@ -911,63 +1090,61 @@ async def chat(
                     )
 
                     if not bot_response:
-                        bot_response = "I apologize, but I didn't receive a proper response. Please try again."
+                        bot_response = _FALLBACK
 
             except Exception as e:
-                logger.error(f"Error in custom agent routing: {e}", exc_info=True)
+                _error(f"Error in custom agent routing: {e}", exc_info=True)
                 enrollment_summary = user_context.get('enrollment_summary', {})
                 enrollment_info = (f"You have {cached_user_details.course_count} courses and "
                                    f"{cached_user_details.event_count} events enrolled. "
                                    f"Karma Points: {enrollment_summary.get('karma_points', 0)}")
                 bot_response = f"I apologize, but I'm experiencing technical difficulties. {enrollment_info} Please try your request again."
 
-            # Step 7: Add bot response to session
-            await add_chat_message(
+            # The user message must be stored before the reply is appended after it
+            if not await user_message_task:
+                _error("Failed to add user message to session")
+                raise _HTTPException(status_code=500, detail="Failed to record user message")
+
+            replied_at = time.time()
+            history_len = len(conversation_history)
+            response_len = len(bot_response)
+            # Steps 8-9: Add bot response and update session context in one write, off the response path
+            _schedule_session_write(finalize_chat_turn(
                 session.session_id,
                 "assistant",
                 bot_response,
                 {
-                    "timestamp": time.time(),
-                    "used_history_messages": len(conversation_history),
-                    "is_anonymous": False,
-                    "response_length": len(bot_response)
-                }
-            )
-
-            # Step 9: Update session context
-            await update_session_data(
-                session.session_id,
+                    **_BOT_MSG_META,
+                    "timestamp": replied_at,
+                    "used_history_messages": history_len,
+                    "response_length": response_len
+                },
                 context_updates={
-                    "last_interaction": time.time(),
-                    "last_user_message": chat_request.message,
-                    "last_bot_response": bot_response[:100] + "..." if len(bot_response) > 100 else bot_response,
-                    "conversation_history_used": len(conversation_history),
+                    **_TURN_CONTEXT,
+                    "last_interaction": replied_at,
+                    "last_user_message": message,
+                    "last_bot_response": _truncate(bot_response, 100),
+                    "conversation_history_used": history_len,
                     "total_conversation_messages": session.message_count + 2,
-                    "is_anonymous": False,
-                    "user_type": "logged_in",
                     "translation_used": translation_context['needs_translation']
                 }
-            )
+            ))
 
             log_agent_activity(
                 agent_name="KarmayogiCustomerAgent",
                 action="chat_complete",
                 user_id=user_id,
-                details=f"Response length: {len(bot_response)}, Session: {session.session_id}"
+                details=f"Response length: {response_len}, Session: {session.session_id}"
             )
 
-            logger.info(f"Logged-in session completed - User: {user_id}, Redis ID: {session.session_id}")
+            _info(f"Logged-in session completed - User: {user_id}, Redis ID: {session.session_id}")
 
-            if mode is not None and mode == "start":
-                bot_response = "Starting new chat session."
-                return {"message": bot_response}
+            if isinstance(bot_response, str):
+                bot_response = bot_response
+            elif hasattr(bot_response, 'response'):
+                bot_response = bot_response.response
             else:
-                if isinstance(bot_response, str):
-                    bot_response = bot_response
-                elif hasattr(bot_response, 'response'):
-                    bot_response = bot_response.response
-                else:
-                    bot_response = "I apologize, but I didn't receive a proper response. Please try again."
+                bot_response = _FALLBACK
 
             # Step 7: Translate response back to user's language
             if translation_context['needs_translation'] and bot_response:
@@ -976,19 +1153,30 @@ async def chat(
                         bot_response,
                         translation_context['detected_language']
                     )
-                    logger.info(f"Translated response back to {translation_context['language_name']}")
+                    _info(f"Translated response back to {translation_context['language_name']}")
             else:
                 final_response = bot_response
 
-        return {"text": final_response, "audio": audio_url}
+        return ORJSONResponse({"text": final_response, "audio": audio_url}, headers=_NO_STORE_HEADERS)
 
-    except HTTPException:
+    except _HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in chat endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        _error(f"Unexpected error in chat endpoint: {e}", exc_info=True)
+        raise _HTTPException(status_code=500, detail=_ERR_PREFIX + str(e))
 
 
 if __name__ == "__main__":
     logger.info("Starting Uvicorn server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Module string (not the app object) so uvicorn can spawn workers; request logging
+    # is handled by RequestLoggingMiddleware, so uvicorn's access log is disabled
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        loop="uvloop",
+        http="httptools",
+        log_config=None,
+        access_log=False
+    )
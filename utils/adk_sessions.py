@@ -0,0 +1,17 @@
+# utils/adk_sessions.py - Helpers for the per-request ADK sessions the agent routers create
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def release_adk_session(session_service, app_name: str, user_id: str, session_id: str):
+    """Delete a per-request ADK session from the shared session service"""
+    try:
+        await session_service.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        # InMemorySessionService keeps an empty per-user map after the last delete; drop it.
+        # This reaches into ADK's private layout, so keep it confined to this helper.
+        user_sessions = getattr(session_service, "sessions", {}).get(app_name, {})
+        if user_id in user_sessions and not user_sessions[user_id]:
+            del user_sessions[user_id]
+    except Exception as e:
+        logger.warning(f"Failed to release ADK session {session_id}: {e}")
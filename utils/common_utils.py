@@ -1,5 +1,4 @@
 # common_utils.py - Common utility functions for ADK Custom Agent
-import json
 import logging
 import os
 import re
@@ -9,7 +8,10 @@ import asyncio
 from qdrant_client import QdrantClient
 from typing import Optional, List, Dict, Any
 from sentence_transformers import SentenceTransformer
-import httpx
+import torch
+import orjson
+
+from utils.http_client import get_http_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -20,40 +22,197 @@ GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", None)
 # FastEmbed model configuration
 EMBEDDING_MODEL_NAME = os.getenv("FASTEMBED_MODEL", "BAAI/bge-small-en-v1.5")  # Fast and efficient model
 VECTOR_SIZE = 384  # Dimension for bge-small-en-v1.5
-
-# Initialize Qdrant client
-qdrant_client = QdrantClient(
-    url=os.getenv("QDRANT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY") if os.getenv("QDRANT_API_KEY") else None
-)
-
+# "sentence_transformers" (PyTorch) or "fastembed" (quantized ONNX Runtime); the Qdrant index must use the same one
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence_transformers").lower()
+# Concurrent encodes and torch threads per encode; together they keep encodes within the CPU budget
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "1"))
+# Concurrent single-query embeddings are coalesced into one encode call
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10"))
+
+_qdrant_client: Optional[QdrantClient] = None
 _embedding_model = None
+_embedding_semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
 
 # QDRANT INTEGRATION - START
+def get_qdrant_client() -> QdrantClient:
+    """Get or initialize the shared Qdrant client"""
+    global _qdrant_client
+    if _qdrant_client is None:
+        _qdrant_client = QdrantClient(
+            url=os.getenv("QDRANT_URL"),
+            api_key=os.getenv("QDRANT_API_KEY") if os.getenv("QDRANT_API_KEY") else None
+        )
+        logger.info("Qdrant client initialized")
+    return _qdrant_client
+
+
 def get_embedding_model():
-    """Get or initialize the FastEmbed model"""
+    """Get or initialize the embedding model for the configured backend"""
     global _embedding_model
     if _embedding_model is None:
         try:
-            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-            logger.info(f"Successfully initialized SentenceTransformer model: {EMBEDDING_MODEL_NAME}")
+            if EMBEDDING_BACKEND == "fastembed":
+                from fastembed import TextEmbedding
+                _embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL_NAME, threads=EMBEDDING_THREADS)
+                logger.info(f"Successfully initialized FastEmbed model: {EMBEDDING_MODEL_NAME}")
+            else:
+                torch.set_num_threads(EMBEDDING_THREADS)
+                _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                logger.info(f"Successfully initialized SentenceTransformer model: {EMBEDDING_MODEL_NAME}")
         except Exception as e:
-            logger.error(f"Failed to initialize SentenceTransformer model: {e}")
+            logger.error(f"Failed to initialize {EMBEDDING_BACKEND} embedding model: {e}")
             raise
     return _embedding_model
 
 
+def _encode(texts: List[str]) -> List[List[float]]:
+    """Embed texts with the configured backend (blocking)"""
+    model = get_embedding_model()
+    if EMBEDDING_BACKEND == "fastembed":
+        return [vector.tolist() for vector in model.embed(texts, batch_size=len(texts))]
+    return model.encode(texts).tolist()
+
+
 async def generate_embeddings(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings using FastEmbed"""
+    """Generate embeddings for texts"""
     try:
-        model = get_embedding_model()
-        embeddings_list = model.encode(texts).tolist()
+        # Encoding is CPU-bound; run it in a worker thread so the event loop stays free
+        async with _embedding_semaphore:
+            embeddings_list = await asyncio.to_thread(_encode, texts)
         logger.info(f"Generated embeddings for {len(texts)} texts")
         return embeddings_list
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise
 
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces concurrent single-query embeddings into one encode call.
+
+    Queries arriving within max_wait_ms of each other share a forward pass; a batch
+    is flushed early once max_batch_size queries are pending.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[tuple] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single query"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _encode_batch(batch: List[tuple]):
+        try:
+            vectors = await generate_embeddings([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+query_embedding_batcher = QueryEmbeddingBatcher(EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS)
+
+
+KNOWLEDGE_BASE_COLLECTION = "igot_docs"
+
+
+def _knowledge_base_result(point, score: float) -> Dict[str, Any]:
+    """Flatten a Qdrant point into the result dict the knowledge-base tools consume"""
+    payload = point.payload or {}
+    return {
+        "id": point.id,
+        "score": score,
+        "title": payload.get("title", "Untitled"),
+        "content": payload.get("content", ""),
+        "category": payload.get("category", "General"),
+        "tags": payload.get("tags", []),
+        "text": payload.get("text", payload.get("content", "")),
+        **payload
+    }
+
+
+async def search_knowledge_base(query: str, limit: int = 5, threshold: float = 0.6,
+                                query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+    """Semantic search over the knowledge base, falling back to text matching on failure"""
+    try:
+        if query_vector is None:
+            query_vector = await query_embedding_batcher.embed(query)
+
+        if not isinstance(query_vector, list) or not all(isinstance(x, (int, float)) for x in query_vector):
+            logger.error(f"Invalid query_vector format: {type(query_vector)}")
+            raise ValueError("Query vector must be a flat list of floats")
+
+        search_result = await asyncio.to_thread(
+            get_qdrant_client().search,
+            collection_name=KNOWLEDGE_BASE_COLLECTION,
+            query_vector=query_vector,
+            limit=limit,
+            score_threshold=threshold
+        )
+
+        results = [_knowledge_base_result(point, point.score) for point in search_result]
+        logger.info(f"Knowledge base search returned {len(results)} results above threshold {threshold}")
+        return results
+
+    except Exception as e:
+        logger.error(f"Error querying knowledge base: {e}")
+        return await _knowledge_base_text_search(query, limit)
+
+
+async def _knowledge_base_text_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Fallback text-based search when semantic search fails"""
+    try:
+        from qdrant_client import models
+
+        search_result, _ = await asyncio.to_thread(
+            get_qdrant_client().scroll,
+            collection_name=KNOWLEDGE_BASE_COLLECTION,
+            scroll_filter=models.Filter(
+                should=[
+                    models.FieldCondition(key="content", match=models.MatchText(text=query)),
+                    models.FieldCondition(key="title", match=models.MatchText(text=query))
+                ]
+            ),
+            limit=limit
+        )
+
+        results = [_knowledge_base_result(point, 0.5) for point in search_result]
+        logger.info(f"Fallback text search returned {len(results)} results")
+        return results
+
+    except Exception as e:
+        logger.error(f"Fallback text search also failed: {e}")
+        return []
+
+
 def _looks_like_verification_data(user_message: str) -> bool:
     """Check if user message looks like verification data (mobile number, OTP, etc.)"""
     message = user_message.strip()
@@ -108,10 +267,15 @@ def _is_general_platform_query(query: str) -> bool:
     return starts_with_general and contains_platform_terms
 
 
+def to_prompt_json(value: Any) -> str:
+    """Serialize data for an LLM prompt as compact JSON"""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 async def rephrase_query_with_history(original_query: str, chat_history: List) -> str:
     """Enhanced rephrasing logic with better general query detection"""
     try:
-        if not isinstance(chat_history, list):
+        if not isinstance(chat_history, (list, tuple)):
             chat_history = []
 
         # PRIORITY 1: Don't rephrase general platform queries
@@ -178,23 +342,24 @@ async def call_gemini_api(prompt: str) -> str:
         headers = {
             "Content-Type": "application/json"
         }
-        logger.debug(f"INSIDE _call_gemini_api BEFORE HTTPX CALL, payload: {json.dumps(payload)}")
+        body = orjson.dumps(payload)
+        logger.debug(f"INSIDE _call_gemini_api BEFORE HTTPX CALL, payload: {len(body)} bytes")
         # Add API key to URL if available
         url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}" if GEMINI_API_KEY else GEMINI_API_URL
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            logger.debug(f"INSIDE _call_gemini_api AFTER HTTPX CALL, response: {response.status_code}")
-            if response.status_code == 200:
-                response_data = response.json()
-                if "candidates" in response_data and len(response_data["candidates"]) > 0:
-                    content = response_data["candidates"][0].get("content", {})
-                    parts = content.get("parts", [])
-                    if parts and "text" in parts[0]:
-                        return parts[0]["text"]
-
-            logger.error(f"Gemini API error: {response.status_code} - {response.text}")
-            return ""
+        client = get_http_client()
+        response = await client.post(url, content=body, headers=headers)
+        logger.debug(f"INSIDE _call_gemini_api AFTER HTTPX CALL, response: {response.status_code}")
+        if response.status_code == 200:
+            response_data = orjson.loads(response.content)
+            if "candidates" in response_data and len(response_data["candidates"]) > 0:
+                content = response_data["candidates"][0].get("content", {})
+                parts = content.get("parts", [])
+                if parts and "text" in parts[0]:
+                    return parts[0]["text"]
+
+        logger.error(f"Gemini API error: {response.status_code} - {response.text}")
+        return ""
 
     except Exception as e:
         logger.error(f"Error calling Gemini API: {e}")
@@ -231,9 +396,9 @@ def load_llm_urls():
         if urls:
             return urls
         else:
-            print("ERROR: No valid URLs found in LOCAL_LLM_URLS")
+            logger.error("No valid URLs found in LOCAL_LLM_URLS")
     else:
-        print("INFO: LOCAL_LLM_URLS not set or empty")
+        logger.info("LOCAL_LLM_URLS not set or empty")
 
     # Default fallback URLs
     default_urls = [
@@ -254,32 +419,33 @@ _current_instance_index = 0
 _instance_response_times: Dict[str, List[float]] = {url: [] for url in LOCAL_LLM_URLS}
 
 
-async def _call_single_llm_instance(url: str, payload: Dict[str, Any], timeout: float = 480.0) -> Dict[str, Any]:
-    """Call a single LLM instance and return response with metadata"""
+async def _call_single_llm_instance(url: str, body: bytes, timeout: float = 480.0) -> Dict[str, Any]:
+    """Call a single LLM instance with a pre-serialized JSON body and return response with metadata"""
     start_time = time.time()
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                url,
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-
-            response_time = time.time() - start_time
-
-            if response.status_code != 200:
-                raise Exception(f"LLM API returned status {response.status_code}: {response.text}")
-
-            response_data = response.json()
-
-            return {
-                "success": True,
-                "response": response_data.get("response", ""),
-                "url": url,
-                "response_time": response_time,
-                "instance": url.split(":")[-2][-5:] if ":" in url else "unknown"
-            }
+        client = get_http_client()
+        response = await client.post(
+            url,
+            content=body,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        )
+
+        response_time = time.time() - start_time
+
+        if response.status_code != 200:
+            raise Exception(f"LLM API returned status {response.status_code}: {response.text}")
+
+        response_data = orjson.loads(response.content)
+
+        return {
+            "success": True,
+            "response": response_data.get("response", ""),
+            "url": url,
+            "response_time": response_time,
+            "instance": url.split(":")[-2][-5:] if ":" in url else "unknown"
+        }
 
     except Exception as e:
         response_time = time.time() - start_time
@@ -307,12 +473,15 @@ async def _call_local_llm_parallel(system_message: str, user_message: str) -> st
         }
     }
 
+    # Serialize once; every instance receives the same body
+    body = orjson.dumps(payload)
+
     logger.debug("Making parallel calls to both LLM instances")
 
     try:
         # Create tasks properly using asyncio.create_task()
         tasks = [
-            asyncio.create_task(_call_single_llm_instance(url, payload, timeout=240.0))
+            asyncio.create_task(_call_single_llm_instance(url, body, timeout=240.0))
             for url in LOCAL_LLM_URLS
         ]
 
@@ -1,12 +1,12 @@
 # utils/contentCache.py - OPTIMIZED VERSION
 import hashlib
-import json
 import logging
 import time
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from typing import Dict, Optional, Any, Tuple, List
 
+import orjson
 from redis.asyncio import Redis
 from dotenv import load_dotenv
 
@@ -17,10 +17,16 @@ from utils.redis_connection_manager import get_redis_client  # ✅ Use shared co
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+try:
+    # SIMD-accelerated cryptographic hash; cookies are bearer credentials, so keys stay collision-resistant
+    from blake3 import blake3 as _cookie_hasher
+except ImportError:
+    _cookie_hasher = hashlib.sha256
+
 
 def hash_cookie(cookie: str) -> str:
     """Hash cookie for cache key generation"""
-    return hashlib.sha256(cookie.encode('utf-8')).hexdigest()
+    return _cookie_hasher(cookie.encode('utf-8')).hexdigest()
 
 
 @dataclass
@@ -53,14 +59,28 @@ class CachedUserDetails:
         """Check if cache entry is expired"""
         return (time.time() - self.cache_timestamp) > (ttl_minutes * 60)
 
+    def __post_init__(self):
+        # Memoized to_dict() result; not a dataclass field, so asdict() ignores it
+        self._dict_cache = None
+
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name != '_dict_cache':
+            super().__setattr__('_dict_cache', None)
+
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for Redis storage"""
-        return asdict(self)
+        """Convert to dictionary for Redis storage (memoized and shared; treat as read-only)"""
+        if self._dict_cache is None:
+            self._dict_cache = asdict(self)
+        return self._dict_cache
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'CachedUserDetails':
         """Create instance from dictionary (Redis retrieval)"""
-        return cls(**data)
+        details = cls(**data)
+        # The decoded Redis payload already is the dict form
+        details._dict_cache = data
+        return details
 
     def get_karma_points(self) -> int:
         """Get karma points from enrollment summary"""
@@ -148,7 +168,7 @@ class ContentCache:
             try:
                 cached_data = await redis_client.get(cache_key)
                 if cached_data:
-                    cached_dict = json.loads(cached_data)
+                    cached_dict = orjson.loads(cached_data)
                     cached_details = CachedUserDetails.from_dict(cached_dict)
 
                     if not cached_details.is_expired(self.default_ttl):
@@ -160,7 +180,7 @@ class ContentCache:
                         # Redis TTL should handle cleanup, but delete explicitly for consistency
                         await redis_client.delete(cache_key, self._generate_summary_key(cache_key))
 
-            except (json.JSONDecodeError, KeyError, TypeError) as e:
+            except (orjson.JSONDecodeError, KeyError, TypeError) as e:
                 logger.warning(f"Failed to deserialize cached data for user {user_id}: {e}")
                 await redis_client.delete(cache_key, self._generate_summary_key(cache_key))
 
@@ -189,8 +209,8 @@ class ContentCache:
 
             # ✅ OPTIMIZED: Use pipeline for atomic operations with shared connection
             async with redis_client.pipeline() as pipe:
-                pipe.set(cache_key, json.dumps(cached_details.to_dict()), ex=ttl_seconds)
-                pipe.set(summary_key, json.dumps(cached_details.to_summary()), ex=ttl_seconds)
+                pipe.set(cache_key, orjson.dumps(cached_details.to_dict()), ex=ttl_seconds)
+                pipe.set(summary_key, orjson.dumps(cached_details.to_summary()), ex=ttl_seconds)
                 await pipe.execute()
 
             logger.info(f"Cached user details for {user_id} (enrollments: {cached_details.total_enrollments})")
@@ -263,18 +283,18 @@ class ContentCache:
             # Try summary first (lighter operation)
             summary_data = await redis_client.get(summary_key)
             if summary_data:
-                return json.loads(summary_data)
+                return orjson.loads(summary_data)
 
             # Fallback to full data if summary not available
             cached_data = await redis_client.get(cache_key)
             if cached_data:
-                cached_dict = json.loads(cached_data)
+                cached_dict = orjson.loads(cached_data)
                 cached_details = CachedUserDetails.from_dict(cached_dict)
 
                 if not cached_details.is_expired(self.default_ttl):
                     return cached_details.to_summary()
 
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
             logger.warning(f"Failed to get summary for user {user_id}: {e}")
 
         return None
@@ -287,13 +307,13 @@ class ContentCache:
         try:
             cached_data = await redis_client.get(cache_key)
             if cached_data:
-                cached_dict = json.loads(cached_data)
+                cached_dict = orjson.loads(cached_data)
                 cached_details = CachedUserDetails.from_dict(cached_dict)
 
                 if not cached_details.is_expired(self.default_ttl):
                     return cached_details
 
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
             logger.warning(f"Failed to get full details for user {user_id}: {e}")
 
         return None
@@ -461,7 +481,7 @@ async def get_cached_user_details(
         channel: str = "web"
 ) -> Tuple[CachedUserDetails, bool]:
     """Get user details from cache or fetch fresh with session integration"""
-    print("ContentCache: get_cached_user_details called")
+    logger.debug("ContentCache: get_cached_user_details called")
     return await user_cache.contentcache_get_user_details(
         user_id, cookie, force_refresh, session_id, app_name, channel
     )
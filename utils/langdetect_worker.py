@@ -0,0 +1,13 @@
+# utils/langdetect_worker.py - Language detection entry point for the detection process pool
+# Spawned pool workers import this module to unpickle detect_language; keep it free of
+# import-time side effects (no service singletons, clients or env loading).
+from typing import Optional
+
+
+def detect_language(text: str) -> Optional[str]:
+    """Run langdetect on text (CPU-bound, holds the GIL); None if undetectable"""
+    from langdetect import detect, LangDetectException
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None
@@ -2,10 +2,35 @@
 import logging
 import logging.handlers
 import os
+import queue
 import sys
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Per-block timing logs are opt-in; when off, LogExecutionTime is a shared no-op context
+PROFILE_TIMINGS = os.getenv("PROFILE_TIMINGS", "false").lower() == "true"
+
+# Access-log records are queued by request handlers and written to disk by a listener thread
+ACCESS_LOG_QUEUE_SIZE = 10_000
+_access_log_queue: queue.Queue = queue.Queue(maxsize=ACCESS_LOG_QUEUE_SIZE)
+_access_log_listener = None
+_access_log_listener_running = False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
 
 class ColoredFormatter(logging.Formatter):
     """Custom formatter with colors for console output"""
@@ -142,10 +167,17 @@ def setup_logging(
         access_file_handler.setFormatter(simple_formatter)
         access_file_handler.suffix = "%Y-%m-%d"
 
-        # Create separate logger for access logs
+        # Create separate logger for access logs; file writes happen on the listener thread
+        global _access_log_listener
+        stop_access_log_listener()
+        _access_log_listener = logging.handlers.QueueListener(
+            _access_log_queue, access_file_handler, respect_handler_level=True
+        )
         access_logger = logging.getLogger("access")
         access_logger.setLevel(logging.INFO)
-        access_logger.addHandler(access_file_handler)
+        for handler in access_logger.handlers[:]:
+            access_logger.removeHandler(handler)
+        access_logger.addHandler(DroppingQueueHandler(_access_log_queue))
         access_logger.propagate = False  # Don't propagate to root logger
 
     # Add all handlers to root logger
@@ -183,6 +215,22 @@ def configure_specific_loggers(level):
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
 
+def start_access_log_listener():
+    """Start writing queued access-log records to the access log file"""
+    global _access_log_listener_running
+    if _access_log_listener is not None and not _access_log_listener_running:
+        _access_log_listener.start()
+        _access_log_listener_running = True
+
+
+def stop_access_log_listener():
+    """Flush queued access-log records and stop the listener thread"""
+    global _access_log_listener_running
+    if _access_log_listener is not None and _access_log_listener_running:
+        _access_log_listener.stop()
+        _access_log_listener_running = False
+
+
 def get_access_logger():
     """Get the access logger for HTTP request logging"""
     return logging.getLogger("access")
@@ -191,6 +239,8 @@ def get_access_logger():
 def log_request(method: str, path: str, status_code: int, duration_ms: float, user_id: str = None):
     """Log HTTP request in structured format"""
     access_logger = get_access_logger()
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
     user_info = f" | User: {user_id}" if user_id else ""
     access_logger.info(f"{method} {path} | {status_code} | {duration_ms:.2f}ms{user_info}")
 
@@ -233,6 +283,18 @@ class LogExecutionTime:
             self.logger.info(f"Completed: {self.operation_name} | Duration: {duration:.2f}ms")
 
 
+_NULL_TIMER = nullcontext()
+
+
+def _disabled_execution_timer(operation_name: str, logger_name: str = None):
+    """Stand-in for LogExecutionTime when PROFILE_TIMINGS is off"""
+    return _NULL_TIMER
+
+
+if not PROFILE_TIMINGS:
+    LogExecutionTime = _disabled_execution_timer
+
+
 # Example usage functions
 def setup_development_logging(log_dir: str = "logs", log_level: str = "DEBUG"):
     """Setup logging for development environment"""
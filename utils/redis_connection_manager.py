@@ -7,7 +7,7 @@ from typing import Optional, Dict, Any
 from contextlib import asynccontextmanager
 
 import redis.asyncio as redis
-from redis.asyncio import Redis, ConnectionPool
+from redis.asyncio import Redis, ConnectionPool, BlockingConnectionPool
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
@@ -39,6 +39,8 @@ class RedisConnectionManager:
 
         # ✅ MINIMAL: Basic connection pool configuration only
         self.max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', '20'))
+        # Seconds a request waits for a free pooled connection before failing
+        self.pool_timeout = float(os.getenv('REDIS_POOL_TIMEOUT', '5'))
 
         # Connection pool and clients
         self._connection_pool: Optional[ConnectionPool] = None
@@ -57,10 +59,11 @@ class RedisConnectionManager:
     async def _create_connection_pool(self) -> ConnectionPool:
         """Create minimal Redis connection pool for maximum compatibility."""
         try:
-            # ✅ ULTRA-MINIMAL: Only the most basic parameters
-            pool = ConnectionPool.from_url(
+            # ✅ Blocking pool: bursts wait for a free connection instead of raising
+            pool = BlockingConnectionPool.from_url(
                 self.redis_url,
                 max_connections=self.max_connections,
+                timeout=self.pool_timeout,
                 decode_responses=True,
             )
 
@@ -1,22 +1,28 @@
 # utils/redis_session_service.py - OPTIMIZED VERSION
-import json
+import asyncio
 import os
 import time
 import uuid
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import weakref
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import numpy as np
+import orjson
 from dotenv import load_dotenv
 from fastembed import TextEmbedding
 
 from redis.asyncio import Redis
+from redis.exceptions import WatchError
 from utils.redis_connection_manager import get_redis_client  # ✅ Use shared connection
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Optimistic-lock retries for a session update that raced a write from another worker
+SESSION_UPDATE_RETRIES = 5
+
 
 @dataclass
 class ChatMessage:
@@ -84,16 +90,17 @@ class AgentSession:
 
     def add_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> ChatMessage:
         """Add a new message to the session"""
+        now = time.time()
         message = ChatMessage(
             message_id=str(uuid.uuid4()),
             role=role,
             content=content,
-            timestamp=time.time(),
+            timestamp=now,
             metadata=metadata or {}
         )
         self.messages.append(message)
         self.message_count = len(self.messages)
-        self.last_activity = time.time()
+        self.last_activity = now
         return message
 
     def get_conversation_history(self, limit: Optional[int] = None) -> List[ChatMessage]:
@@ -137,6 +144,9 @@ class RedisSessionService:
         self.max_messages = max_messages_per_session
         self.key_prefix = key_prefix
         self._embedding_model = None
+        # Serialises updates of one session within this process so they don't burn WATCH retries;
+        # _modify_session's WATCH/MULTI makes them safe across workers
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
         logger.info(
             f"RedisSessionService initialized - TTL: {session_ttl_hours}h, Max messages: {max_messages_per_session}")
@@ -145,6 +155,14 @@ class RedisSessionService:
         """✅ OPTIMIZED: Get Redis client from shared connection manager"""
         return await get_redis_client()
 
+    def session_lock(self, session_id: str) -> asyncio.Lock:
+        """Lock guarding read-modify-write updates of a session"""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
     def _generate_session_key(self, session_id: str) -> str:
         """Generate Redis key for session"""
         return f"{self.key_prefix}{session_id}"
@@ -159,16 +177,36 @@ class RedisSessionService:
         user_sessions_key = self._generate_user_sessions_key(app_name, user_id)
 
         try:
-            session_ids = await redis_client.smembers(user_sessions_key)
-            sessions = []
+            session_ids = list(await redis_client.smembers(user_sessions_key))
+            if not session_ids:
+                return []
 
-            for session_id in session_ids:
-                session = await self.get_session(session_id)
-                if session:
-                    sessions.append(session)
-                else:
-                    # Clean up orphaned session ID
-                    await redis_client.srem(user_sessions_key, session_id)
+            # All session blobs fetched in one round-trip
+            session_blobs = await redis_client.mget(
+                [self._generate_session_key(session_id) for session_id in session_ids]
+            )
+
+            sessions = []
+            orphaned_ids = []
+            corrupt_keys = []
+            for session_id, session_data in zip(session_ids, session_blobs):
+                if not session_data:
+                    orphaned_ids.append(session_id)
+                    continue
+                try:
+                    sessions.append(AgentSession.from_dict(orjson.loads(session_data)))
+                except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                    logger.warning(f"Failed to deserialize session {session_id}: {e}")
+                    orphaned_ids.append(session_id)
+                    corrupt_keys.append(self._generate_session_key(session_id))
+
+            if orphaned_ids:
+                # Clean up orphaned session IDs
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.srem(user_sessions_key, *orphaned_ids)
+                    if corrupt_keys:
+                        pipe.delete(*corrupt_keys)
+                    await pipe.execute()
 
             # Sort by last activity (most recent first)
             sessions.sort(key=lambda s: s.last_activity, reverse=True)
@@ -204,8 +242,14 @@ class RedisSessionService:
             agent_state={}
         )
 
-        await self._save_session(session)
-        await self._add_to_user_sessions(app_name, user_id, session_id)
+        # Session blob + user index written in one round-trip
+        redis_client = await self.get_redis()
+        user_sessions_key = self._generate_user_sessions_key(app_name, user_id)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(self._generate_session_key(session_id), orjson.dumps(session.to_dict()), ex=self.session_ttl)
+            pipe.sadd(user_sessions_key, session_id)
+            pipe.expire(user_sessions_key, self.session_ttl)
+            await pipe.execute()
 
         logger.info(f"Created new session: {session_id} for user: {user_id}")
         return session
@@ -243,11 +287,11 @@ class RedisSessionService:
         try:
             session_data = await redis_client.get(session_key)
             if session_data:
-                session_dict = json.loads(session_data)
+                session_dict = orjson.loads(session_data)
                 session = AgentSession.from_dict(session_dict)
 
                 return session
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
             logger.warning(f"Failed to deserialize session {session_id}: {e}")
             await redis_client.delete(session_key)
 
@@ -258,6 +302,63 @@ class RedisSessionService:
         session.last_activity = time.time()
         return await self._save_session(session)
 
+    async def _modify_session(self, session_id: str, modify: Callable[[AgentSession], Any]) -> Any:
+        """
+        Apply modify to the stored session and save it atomically; returns modify's result,
+        or None if the session is missing or the update failed.
+
+        The session key is WATCHed, so a write by another worker between our read and
+        our save aborts the transaction and the update is retried on fresh data.
+        """
+        redis_client = await self.get_redis()
+        session_key = self._generate_session_key(session_id)
+
+        async with self.session_lock(session_id):
+            for _ in range(SESSION_UPDATE_RETRIES):
+                try:
+                    async with redis_client.pipeline(transaction=True) as pipe:
+                        await pipe.watch(session_key)
+                        session_data = await pipe.get(session_key)
+                        if not session_data:
+                            logger.error(f"Session not found: {session_id}")
+                            return None
+
+                        session = AgentSession.from_dict(orjson.loads(session_data))
+                        result = modify(session)
+
+                        pipe.multi()
+                        pipe.set(session_key, orjson.dumps(session.to_dict()), ex=self.session_ttl)
+                        await pipe.execute()
+                        return result
+                except WatchError:
+                    logger.debug(f"Session {session_id} changed during update, retrying")
+                except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                    logger.warning(f"Failed to deserialize session {session_id}: {e}")
+                    await redis_client.delete(session_key)
+                    return None
+                except Exception as e:
+                    logger.error(f"Failed to update session {session_id}: {e}")
+                    return None
+
+        logger.error(f"Gave up updating session {session_id} after {SESSION_UPDATE_RETRIES} conflicting writes")
+        return None
+
+    def _append_message(
+            self,
+            session: AgentSession,
+            role: str,
+            content: str,
+            metadata: Optional[Dict[str, Any]] = None
+    ) -> ChatMessage:
+        """Add a message to a loaded session, trimming old messages at the limit"""
+        if len(session.messages) >= self.max_messages:
+            # Keep last 80% of messages
+            keep_count = int(self.max_messages * 0.8)
+            session.messages = session.messages[-keep_count:]
+            logger.info(f"Trimmed session {session.session_id} to {keep_count} messages")
+
+        return session.add_message(role, content, metadata)
+
     async def add_message_to_session(
             self,
             session_id: str,
@@ -266,21 +367,27 @@ class RedisSessionService:
             metadata: Optional[Dict[str, Any]] = None
     ) -> Optional[ChatMessage]:
         """✅ OPTIMIZED: Add message to session using shared Redis connection"""
-        session = await self.get_session(session_id)
-        if not session:
-            logger.error(f"Session not found: {session_id}")
-            return None
+        return await self._modify_session(
+            session_id, lambda session: self._append_message(session, role, content, metadata)
+        )
 
-        # Trim messages if approaching limit
-        if len(session.messages) >= self.max_messages:
-            # Keep last 80% of messages
-            keep_count = int(self.max_messages * 0.8)
-            session.messages = session.messages[-keep_count:]
-            logger.info(f"Trimmed session {session_id} to {keep_count} messages")
+    async def finalize_turn(
+            self,
+            session_id: str,
+            role: str,
+            content: str,
+            metadata: Optional[Dict[str, Any]] = None,
+            context_updates: Optional[Dict[str, Any]] = None
+    ) -> Optional[ChatMessage]:
+        """Add a message and apply context updates with a single load and save"""
+        def modify(session: AgentSession) -> ChatMessage:
+            # add_message stamps last_activity; reuse that clock read for the context update
+            message = self._append_message(session, role, content, metadata)
+            if context_updates:
+                session.context.update(context_updates)
+            return message
 
-        message = session.add_message(role, content, metadata)
-        await self.update_session(session)
-        return message
+        return await self._modify_session(session_id, modify)
 
     async def get_conversation_history(
             self,
@@ -300,12 +407,11 @@ class RedisSessionService:
             context_updates: Dict[str, Any]
     ) -> bool:
         """✅ OPTIMIZED: Update session context using shared Redis connection"""
-        session = await self.get_session(session_id)
-        if not session:
-            return False
+        def modify(session: AgentSession) -> bool:
+            session.update_context(context_updates)
+            return True
 
-        session.update_context(context_updates)
-        return await self.update_session(session)
+        return bool(await self._modify_session(session_id, modify))
 
     async def update_agent_state(
             self,
@@ -313,12 +419,11 @@ class RedisSessionService:
             agent_state: Dict[str, Any]
     ) -> bool:
         """✅ OPTIMIZED: Update agent state using shared Redis connection"""
-        session = await self.get_session(session_id)
-        if not session:
-            return False
+        def modify(session: AgentSession) -> bool:
+            session.update_agent_state(agent_state)
+            return True
 
-        session.update_agent_state(agent_state)
-        return await self.update_session(session)
+        return bool(await self._modify_session(session_id, modify))
 
     async def _save_session(self, session: AgentSession) -> bool:
         """✅ OPTIMIZED: Save session to Redis using shared connection"""
@@ -328,7 +433,7 @@ class RedisSessionService:
         try:
             session_dict = session.to_dict()
 
-            session_data = json.dumps(session_dict)
+            session_data = orjson.dumps(session_dict)
             await redis_client.set(session_key, session_data, ex=self.session_ttl)
 
             logger.debug(f"Session {session.session_id} saved successfully")
@@ -342,8 +447,10 @@ class RedisSessionService:
         redis_client = await self.get_redis()  # ✅ Uses shared connection
         user_sessions_key = self._generate_user_sessions_key(app_name, user_id)
 
-        await redis_client.sadd(user_sessions_key, session_id)
-        await redis_client.expire(user_sessions_key, self.session_ttl)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.sadd(user_sessions_key, session_id)
+            pipe.expire(user_sessions_key, self.session_ttl)
+            await pipe.execute()
 
     async def health_check(self) -> Dict[str, Any]:
         """✅ OPTIMIZED: Health check using shared Redis connection and manager"""
@@ -409,6 +516,19 @@ async def add_chat_message(
     )
 
 
+async def finalize_chat_turn(
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        context_updates: Optional[Dict[str, Any]] = None
+) -> Optional[ChatMessage]:
+    """Add the closing message of a turn and update session context in one write"""
+    return await redis_session_service.finalize_turn(
+        session_id, role, content, metadata, context_updates
+    )
+
+
 async def get_session_context(session_id: str) -> Optional[Dict[str, Any]]:
     """Get session context"""
     session = await redis_session_service.get_session(session_id)
@@ -421,6 +541,15 @@ async def update_session_data(
         agent_state: Optional[Dict[str, Any]] = None
 ) -> bool:
     """Update session context and/or agent state"""
+    if context_updates and agent_state:
+        # Both updates applied to one loaded session and saved once
+        def modify(session: AgentSession) -> bool:
+            session.update_context(context_updates)
+            session.update_agent_state(agent_state)
+            return True
+
+        return bool(await redis_session_service._modify_session(session_id, modify))
+
     success = True
 
     if context_updates:
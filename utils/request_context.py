@@ -1,13 +1,13 @@
 # utils/request_context.py
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 from dataclasses import dataclass
 from utils.redis_session_service import ChatMessage
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class RequestContext:
     """Request-scoped context to avoid global state issues"""
     user_id: str
@@ -15,7 +15,7 @@ class RequestContext:
     cookie: str
     cookie_hash: str
     user_context: Optional[Dict[str, Any]] = None
-    chat_history: Optional[List[ChatMessage]] = None
+    chat_history: Optional[Sequence[ChatMessage]] = None
     is_anonymous: bool = False
     session_info: Optional[Dict[str, Any]] = None
 
@@ -0,0 +1,171 @@
+# utils/semantic_cache.py - Semantic cache for knowledge-base answers, shared across workers via Redis
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import List, Optional, Sequence
+
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+
+from utils.redis_connection_manager import get_redis_client
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_SHARED = os.getenv("SEMANTIC_CACHE_SHARED", "true").lower() == "true"
+SEMANTIC_CACHE_STREAM_KEY = "semantic_cache:answers"
+# Minimum seconds between pulls of other workers' answers, bounding Redis round trips
+SEMANTIC_CACHE_SYNC_INTERVAL = 0.5
+
+
+class SemanticResponseCache:
+    """
+    Answers keyed by query embedding: a new query reuses a cached answer when its
+    cosine similarity to a cached query in the same scope reaches the threshold.
+
+    Entries live in a preallocated matrix; once full, the least recently used row is
+    overwritten. Entries older than the TTL are ignored so knowledge-base updates
+    reach users without a restart.
+
+    With a redis_key, every answer is also appended to a capped Redis stream and each
+    worker pulls the other workers' answers into its own matrix before a lookup, so
+    an FAQ answered by one worker is a hit on all of them. Similarity search itself
+    stays in-process; Redis only carries the entries.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: int, redis_key: Optional[str] = None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.redis_key = redis_key
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), L2-normalised rows
+        self._scopes: List[Optional[str]] = [None] * max_entries
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._created = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._size = 0
+        self._origin = uuid.uuid4().hex  # Marks this process's entries in the shared stream
+        self._last_stream_id = "0-0"
+        self._last_sync = 0.0
+        self._sync_lock = asyncio.Lock()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    async def get(self, scope: str, vector: Sequence[float]) -> Optional[str]:
+        """Return the cached answer closest to vector in scope, if similar enough"""
+        await self._sync()
+        if not self._size:
+            return None
+
+        sims = self._vectors[:self._size] @ self._normalize(vector)
+        candidates = np.flatnonzero(sims >= self.threshold)
+        now = time.time()
+        for i in candidates[np.argsort(sims[candidates])[::-1]]:
+            if self._scopes[i] == scope and now - self._created[i] < self.ttl_seconds:
+                self._last_used[i] = now
+                logger.debug(f"Semantic cache hit (similarity {sims[i]:.3f})")
+                return self._responses[i]
+        return None
+
+    async def put(self, scope: str, vector: Sequence[float], response: str):
+        """Cache an answer for the query embedded as vector and share it with other workers"""
+        if self.max_entries <= 0:
+            return
+
+        self._insert(scope, self._normalize(vector), response, time.time())
+        await self._publish(scope, vector, response)
+
+    def _insert(self, scope: str, v: np.ndarray, response: str, created: float):
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+
+        if self._size < self.max_entries:
+            i = self._size
+            self._size += 1
+        else:
+            i = int(np.argmin(self._last_used))
+
+        self._vectors[i] = v
+        self._scopes[i] = scope
+        self._responses[i] = response
+        self._created[i] = created
+        self._last_used[i] = created
+
+    async def _publish(self, scope: str, vector: Sequence[float], response: str):
+        """Append an answer to the shared stream; failures leave it cached in this process only"""
+        if not self.redis_key:
+            return
+
+        try:
+            entry = orjson.dumps(
+                {"origin": self._origin, "scope": scope, "vector": vector, "response": response},
+                option=orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
+            redis_client = await get_redis_client()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.xadd(self.redis_key, {"entry": entry}, maxlen=self.max_entries, approximate=True)
+                pipe.expire(self.redis_key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to share semantic cache entry: {e}")
+
+    async def _sync(self):
+        """Pull answers other workers added to the shared stream since the last sync"""
+        if not self.redis_key or self.max_entries <= 0 or self._sync_lock.locked():
+            return
+
+        now = time.time()
+        if now - self._last_sync < SEMANTIC_CACHE_SYNC_INTERVAL:
+            return
+
+        async with self._sync_lock:
+            self._last_sync = now
+            try:
+                redis_client = await get_redis_client()
+                entries = await redis_client.xrange(self.redis_key, min=self._last_stream_id, count=self.max_entries)
+            except Exception as e:
+                logger.warning(f"Failed to read shared semantic cache: {e}")
+                return
+
+            for stream_id, fields in entries:
+                if stream_id == self._last_stream_id:
+                    continue  # XRANGE min is inclusive
+                self._last_stream_id = stream_id
+
+                created = int(stream_id.split("-", 1)[0]) / 1000  # Stream IDs start with the add time in ms
+                if now - created >= self.ttl_seconds:
+                    continue
+                try:
+                    entry = orjson.loads(fields["entry"])
+                    if entry["origin"] != self._origin:
+                        self._insert(entry["scope"], self._normalize(entry["vector"]), entry["response"], created)
+                except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                    logger.debug(f"Skipping malformed semantic cache entry {stream_id}: {e}")
+
+    def clear(self):
+        """Drop all answers cached in this process"""
+        self._vectors = None
+        self._size = 0
+        self._scopes = [None] * self.max_entries
+        self._responses = [None] * self.max_entries
+        self._created = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+
+
+# Global cache instance shared by the knowledge-base tools
+semantic_response_cache = SemanticResponseCache(
+    max_entries=SEMANTIC_CACHE_SIZE,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=SEMANTIC_CACHE_TTL,
+    redis_key=SEMANTIC_CACHE_STREAM_KEY if SEMANTIC_CACHE_SHARED else None
+)
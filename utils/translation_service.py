@@ -2,13 +2,94 @@
 
 import asyncio
 import logging
+import multiprocessing
 import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import lru_cache
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import threading
 
+import orjson
+
+from utils.http_client import get_http_client
+from utils.langdetect_worker import detect_language as _detect_language_worker
+
 logger = logging.getLogger(__name__)
 
+LANGDETECT_WORKERS = int(os.getenv("LANGDETECT_WORKERS", "2"))
+DETECTION_CACHE_SIZE = 1000
+TRANSLATION_CACHE_SIZE = 4096
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "16"))
+TRANSLATION_BATCH_WAIT_MS = float(os.getenv("TRANSLATION_BATCH_WAIT_MS", "8"))
+GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+
+class TranslationBatcher:
+    """
+    Coalesces concurrent translations for the same language pair into one API call.
+
+    Texts arriving within max_wait_ms of each other share a request; a batch is sent
+    early once max_batch_size texts are pending for that pair.
+    """
+
+    def __init__(self, translate_batch, max_batch_size: int, max_wait_ms: float):
+        self._translate_batch = translate_batch  # async (texts, source_lang, target_lang) -> translations
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Dict[tuple, List[tuple]] = {}
+        self._flush_timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def translate(self, text: str, source_lang: str, target_lang: str) -> str:
+        """Translate a single text"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pair = (source_lang, target_lang)
+        pending = self._pending.setdefault(pair, [])
+        pending.append((text, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(pair)
+        elif pair not in self._flush_timers:
+            self._flush_timers[pair] = loop.call_later(self.max_wait, self._flush, pair)
+        return await future
+
+    def _flush(self, pair: tuple):
+        timer = self._flush_timers.pop(pair, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(pair, None)
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send_batch(pair, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, pair: tuple, batch: List[tuple]):
+        texts = [text for text, _ in batch]
+        try:
+            translations = await self._translate_batch(texts, *pair)
+            if len(translations) != len(batch):
+                logger.warning(f"Translation batch returned {len(translations)} results for {len(batch)} texts; "
+                               f"unmatched texts are returned unchanged")
+            for (_, future), translation in zip(batch, translations):
+                if not future.done():
+                    future.set_result(translation)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Never leave a caller waiting: anything still unresolved gets its original text
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(text)
+
 
 class TranslationService:
     """Standalone translation service utility with proper async handling"""
@@ -21,65 +102,61 @@ class TranslationService:
 
         self.google_translate_client = None
         self.google_api_key = None
-        self._translation_cache = {}  # Simple in-memory cache
+        self._translation_cache: "OrderedDict[str, str]" = OrderedDict()  # LRU, bounded by TRANSLATION_CACHE_SIZE
         self._cache_lock = threading.Lock()
+        self._detection_pool: Optional[ProcessPoolExecutor] = None
+        self._detection_workers = 0
+        self._detected_languages: "OrderedDict[str, str]" = OrderedDict()  # LRU, bounded by DETECTION_CACHE_SIZE
+        self._rest_batcher = TranslationBatcher(
+            self._translate_batch_with_rest_api, TRANSLATION_BATCH_SIZE, TRANSLATION_BATCH_WAIT_MS
+        )
         self._initialize_translation_client()
 
+    def start_detection_pool(self, max_workers: int = LANGDETECT_WORKERS):
+        """Start the process pool used for language detection"""
+        if self._detection_pool is None and max_workers > 0:
+            # Spawn rather than fork: the app process already runs threads (torch, Opik, log listener)
+            # whose locks a forked child could inherit mid-acquire and deadlock on
+            self._detection_pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._detection_workers = max_workers
+            logger.info(f"✅ Language detection process pool started - Workers: {max_workers}")
+
+    def _restart_detection_pool(self, broken_pool: ProcessPoolExecutor):
+        """Replace a broken detection pool with a fresh one of the same size"""
+        if self._detection_pool is not broken_pool:
+            return  # Another request already restarted it
+        self._detection_pool = None
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+        self.start_detection_pool(self._detection_workers)
+
+    def shutdown_detection_pool(self):
+        """Stop the language detection process pool"""
+        if self._detection_pool is not None:
+            self._detection_pool.shutdown(wait=False, cancel_futures=True)
+            self._detection_pool = None
+            logger.info("✅ Language detection process pool stopped")
+
     def _initialize_translation_client(self):
         """Initialize Google Translate client if credentials available"""
         try:
-            # Debug: Check environment variables
-            google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            google_api_key = os.getenv("GOOGLE_API_KEY")
-
-            logger.info(f"GOOGLE_APPLICATION_CREDENTIALS: {'Set' if google_creds else 'Not set'}")
-            logger.info(f"GOOGLE_API_KEY: {'Set' if google_api_key else 'Not set'}")
-
-            if google_api_key:
-                logger.info(f"API Key preview: {google_api_key[:10]}...")
+            logger.info(f"GOOGLE_APPLICATION_CREDENTIALS: {'Set' if GOOGLE_APPLICATION_CREDENTIALS else 'Not set'}")
+            logger.info(f"GOOGLE_API_KEY: {'Set' if GOOGLE_API_KEY else 'Not set'}")
 
             # Try different ways to initialize Google Translate
-            if google_creds:
+            if GOOGLE_APPLICATION_CREDENTIALS:
                 logger.info("Attempting to initialize with service account credentials...")
                 from google.cloud import translate_v2 as translate
                 self.google_translate_client = translate.Client()
                 logger.info("✅ Google Cloud Translate client initialized with service account")
 
-            elif google_api_key:
+            elif GOOGLE_API_KEY:
                 logger.info("Attempting to initialize with API key using REST API...")
-                self.google_api_key = google_api_key
+                self.google_api_key = GOOGLE_API_KEY
                 self.google_translate_client = "api_key_mode"
                 logger.info("✅ Google Translate configured for API key mode")
 
-                # Test the API key with a synchronous test
-                try:
-                    import httpx
-
-                    url = "https://translation.googleapis.com/language/translate/v2"
-                    params = {
-                        'key': google_api_key,
-                        'q': 'hello',
-                        'target': 'hi',
-                        'format': 'text'
-                    }
-
-                    with httpx.Client() as client:
-                        response = client.post(url, params=params)
-
-                        if response.status_code == 200:
-                            result = response.json()
-                            translated_text = result['data']['translations'][0]['translatedText']
-                            logger.info(f"✅ API key test successful: hello -> {translated_text}")
-                        else:
-                            logger.error(f"❌ API key test failed: {response.status_code} - {response.text}")
-                            self.google_translate_client = None
-                            self.google_api_key = None
-
-                except Exception as test_error:
-                    logger.error(f"❌ API key translation test failed: {test_error}")
-                    self.google_translate_client = None
-                    self.google_api_key = None
-
             else:
                 logger.warning("❌ No Google Translate credentials found. Translation will be limited.")
 
@@ -93,21 +170,51 @@ class TranslationService:
             import traceback
             logger.error(f"Full traceback: {traceback.format_exc()}")
 
-    @lru_cache(maxsize=1000)
-    def _detect_language_cached(self, text_hash: str, text: str) -> str:
-        """Cached language detection to avoid repeated API calls"""
-        from langdetect import detect, LangDetectException
+    async def verify_api_key(self):
+        """Check the REST API key with a test translation; disables API key mode if it fails"""
+        if self.google_translate_client != "api_key_mode":
+            return
+
         try:
-            detected_lang = detect(text)
+            url = "https://translation.googleapis.com/language/translate/v2"
+            params = {
+                'key': self.google_api_key,
+                'q': 'hello',
+                'target': 'hi',
+                'format': 'text'
+            }
+
+            response = await get_http_client().post(url, params=params, timeout=5.0)
 
-            if detected_lang in self.supported_languages:
-                logger.debug(f"Detected language: {detected_lang} ({self.supported_languages[detected_lang]})")
-                return detected_lang
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                translated_text = result['data']['translations'][0]['translatedText']
+                logger.info(f"✅ API key test successful: hello -> {translated_text}")
             else:
-                logger.debug(f"Detected unsupported language: {detected_lang}, defaulting to English")
-                return 'en'
+                logger.error(f"❌ API key test failed: {response.status_code} - {response.text}")
+                self.google_translate_client = None
+                self.google_api_key = None
+
+        except Exception as test_error:
+            logger.error(f"❌ API key translation test failed: {test_error}")
+            self.google_translate_client = None
+            self.google_api_key = None
+
+    def _normalize_detected_language(self, detected_lang: Optional[str]) -> str:
+        """Map a detected language code to a supported one, defaulting to English"""
+        if detected_lang in self.supported_languages:
+            logger.debug(f"Detected language: {detected_lang} ({self.supported_languages[detected_lang]})")
+            return detected_lang
+
+        logger.debug(f"Detected unsupported or unknown language: {detected_lang}, defaulting to English")
+        return 'en'
 
-        except (LangDetectException, Exception) as e:
+    @lru_cache(maxsize=1000)
+    def _detect_language_cached(self, text_hash: str, text: str) -> str:
+        """Cached language detection to avoid repeated API calls"""
+        try:
+            return self._normalize_detected_language(_detect_language_worker(text))
+        except Exception as e:
             logger.debug(f"Language detection failed for text: {e}")
             return 'en'  # Default to English
 
@@ -116,9 +223,37 @@ class TranslationService:
         if not text or len(text.strip()) < 3:
             return 'en'
 
-        # Create a simple hash for caching (first 100 chars)
-        text_hash = str(hash(text[:100]))
-        return self._detect_language_cached(text_hash, text)
+        if self._detection_pool is None:
+            # Create a simple hash for caching (first 100 chars)
+            text_hash = str(hash(text[:100]))
+            return self._detect_language_cached(text_hash, text)
+
+        with self._cache_lock:
+            cached_lang = self._detected_languages.get(text)
+            if cached_lang is not None:
+                self._detected_languages.move_to_end(text)
+                return cached_lang
+
+        pool = self._detection_pool
+        try:
+            loop = asyncio.get_running_loop()
+            detected_lang = self._normalize_detected_language(
+                await loop.run_in_executor(pool, _detect_language_worker, text)
+            )
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); restart the pool and detect this message inline
+            logger.warning(f"⚠️ Language detection pool broken, restarting it: {e}")
+            self._restart_detection_pool(pool)
+            return self._detect_language_cached(str(hash(text[:100])), text)
+        except Exception as e:
+            logger.debug(f"Language detection failed for text: {e}")
+            return 'en'  # Default to English
+
+        with self._cache_lock:
+            self._detected_languages[text] = detected_lang
+            if len(self._detected_languages) > DETECTION_CACHE_SIZE:
+                self._detected_languages.popitem(last=False)
+        return detected_lang
 
     def _get_cache_key(self, text: str, source_lang: str, target_lang: str) -> str:
         """Generate cache key for translation"""
@@ -127,49 +262,49 @@ class TranslationService:
     def _get_cached_translation(self, cache_key: str) -> str:
         """Get translation from cache thread-safely"""
         with self._cache_lock:
-            return self._translation_cache.get(cache_key)
+            translation = self._translation_cache.get(cache_key)
+            if translation is not None:
+                self._translation_cache.move_to_end(cache_key)
+            return translation
 
     def _set_cached_translation(self, cache_key: str, translation: str):
         """Set translation in cache thread-safely"""
         with self._cache_lock:
-            # Keep cache size reasonable
-            if len(self._translation_cache) > 1000:
-                # Remove oldest half of cache
-                keys_to_remove = list(self._translation_cache.keys())[:500]
-                for key in keys_to_remove:
-                    del self._translation_cache[key]
-
             self._translation_cache[cache_key] = translation
+            self._translation_cache.move_to_end(cache_key)
+            if len(self._translation_cache) > TRANSLATION_CACHE_SIZE:
+                self._translation_cache.popitem(last=False)
 
     async def _translate_with_rest_api(self, text: str, source_lang: str, target_lang: str) -> str:
-        """Translate using Google Translate REST API with API key"""
-        try:
-            import httpx
+        """Translate using Google Translate REST API, batched with concurrent requests for the same pair"""
+        return await self._rest_batcher.translate(text, source_lang, target_lang)
 
+    async def _translate_batch_with_rest_api(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        """Translate several texts in one Google Translate REST API call; failed texts come back unchanged"""
+        try:
             url = "https://translation.googleapis.com/language/translate/v2"
-            params = {
-                'key': self.google_api_key,
-                'q': text,
+            data = {
+                'q': texts,
                 'source': source_lang,
                 'target': target_lang,
                 'format': 'text'
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params)
+            client = get_http_client()
+            response = await client.post(url, params={'key': self.google_api_key}, data=data, timeout=5.0)
 
-                if response.status_code == 200:
-                    result = response.json()
-                    translated_text = result['data']['translations'][0]['translatedText']
-                    logger.debug(f"REST API translation successful: {text[:30]}... -> {translated_text[:30]}...")
-                    return translated_text
-                else:
-                    logger.error(f"REST API translation failed: {response.status_code} - {response.text}")
-                    return text
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                translations = [t['translatedText'] for t in result['data']['translations']]
+                logger.debug(f"REST API translated {len(texts)} text(s) {source_lang} -> {target_lang}")
+                return translations
+            else:
+                logger.error(f"REST API translation failed: {response.status_code} - {response.text}")
+                return texts
 
         except Exception as e:
             logger.error(f"REST API translation error: {e}")
-            return text
+            return texts
 
     async def _translate_with_client_library(self, text: str, source_lang: str, target_lang: str) -> str:
         """Translate using Google Cloud client library (synchronous in executor)"""
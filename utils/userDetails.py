@@ -4,18 +4,30 @@ import logging
 import os
 import re
 import uuid
+from collections import Counter
 from typing import Dict, List, Any
 
 import httpx
+import orjson
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
+from utils.http_client import get_http_client
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Request body for the course enrollment list API
+COURSE_ENROL_LIST_BODY = {
+    "request": {
+        "retiredCoursesEnabled": True,
+        "status": ["In-Progress", "Completed"]
+    }
+}
+
 class UserDetailsResponse(BaseModel):
     """Response model for user details"""
     user_id: str
@@ -377,28 +389,14 @@ def course_enrollments_summary(user_course_enrollment_info: Dict[str, Any],
         if time_spent is not None and time_spent != '':
             summary['time_spent_on_completed_courses_in_minutes'] = time_spent
 
-    # Initialize counters
-    not_started_count = 0
-    in_progress_count = 0
-    completed_count = 0
-    certified_count = 0
-
     # Count courses by status and certificates
-    if isinstance(cleaned_course_enrollments, list):
-        for course in cleaned_course_enrollments:
-            if isinstance(course, dict):
-                # Count by completion status
-                completion_status = course.get('course_completion_status', '').lower()
-                if completion_status == 'not started':
-                    not_started_count += 1
-                elif completion_status == 'in progress':
-                    in_progress_count += 1
-                elif completion_status == 'completed':
-                    completed_count += 1
-
-                # Count certified courses
-                if course.get('course_issued_certificate_id') is not None and course.get('course_issued_certificate_id') != '':
-                    certified_count += 1
+    courses = [c for c in cleaned_course_enrollments if isinstance(c, dict)] \
+        if isinstance(cleaned_course_enrollments, list) else []
+    status_counts = Counter((c.get('course_completion_status') or '').lower() for c in courses)
+    not_started_count = status_counts['not started']
+    in_progress_count = status_counts['in progress']
+    completed_count = status_counts['completed']
+    certified_count = sum(1 for c in courses if c.get('course_issued_certificate_id') not in (None, ''))
 
     # Add counts to summary (only if greater than 0)
     if not_started_count > 0:
@@ -433,34 +431,18 @@ def event_enrollments_summary(cleaned_event_enrollments: List[Dict[str, Any]]) -
     # Initialize summary object
     summary = {}
 
-    # Initialize counters
-    total_time_spent = 0
-    not_started_count = 0
-    in_progress_count = 0
-    completed_count = 0
-    certified_count = 0
-
-    # Process each event enrollment
-    if isinstance(cleaned_event_enrollments, list):
-        for event in cleaned_event_enrollments:
-            if isinstance(event, dict):
-                # Sum up consumption time
-                consumption_time = event.get('event_consumption_time_in_minutes')
-                if consumption_time is not None and isinstance(consumption_time, (int, float)):
-                    total_time_spent += consumption_time
-
-                # Count by completion status
-                completion_status = event.get('event_completion_status', '').lower()
-                if completion_status == 'not started':
-                    not_started_count += 1
-                elif completion_status == 'in progress':
-                    in_progress_count += 1
-                elif completion_status == 'completed':
-                    completed_count += 1
-
-                # Count certified events
-                if event.get('event_issued_certificate_id') is not None and event.get('event_issued_certificate_id') != '':
-                    certified_count += 1
+    # Count events by status and certificates, and sum their consumption time
+    events = [e for e in cleaned_event_enrollments if isinstance(e, dict)] \
+        if isinstance(cleaned_event_enrollments, list) else []
+    total_time_spent = sum(
+        t for t in (e.get('event_consumption_time_in_minutes') for e in events)
+        if isinstance(t, (int, float))
+    )
+    status_counts = Counter((e.get('event_completion_status') or '').lower() for e in events)
+    not_started_count = status_counts['not started']
+    in_progress_count = status_counts['in progress']
+    completed_count = status_counts['completed']
+    certified_count = sum(1 for e in events if e.get('event_issued_certificate_id') not in (None, ''))
 
     # Add metrics to summary (only if greater than 0)
     if total_time_spent > 0:
@@ -542,6 +524,23 @@ class UserDetailsService:
         if not self.api_key:
             logger.warning("KARMAYOGI_API_KEY not found in environment variables")
 
+        # Unset endpoints would otherwise surface per request as calls to "None/..." URLs
+        required_vars = ['learning_service_url', 'lms_service_url', 'private_user_read_api',
+                         'private_course_enrol_list_api', 'private_event_enrol_list_api']
+        missing_vars = [var for var in required_vars if not os.getenv(var)]
+        if missing_vars:
+            logger.error(f"Missing Karmayogi API configuration: {', '.join(missing_vars)}")
+
+        # Request headers are the same for every call; httpx copies them per request
+        self._read_headers = {
+            "accept": "application/json, text/plain, */*",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        self._json_headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
     async def get_user_details(self, user_id: str) -> UserDetailsResponse:
         """
         Main method to get user details and enrollment information.
@@ -618,36 +617,33 @@ class UserDetailsService:
             :param user_id:
         """
         url = f"{self.learning_service_url}{self.private_user_read_api}{user_id}"
-        headers = {
-            "accept": "application/json, text/plain, */*",
-            "Authorization": f"Bearer {self.api_key}",
-        }
+        headers = self._read_headers
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling user details API: {url}")
-                response = await client.get(url, headers=headers)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    raw_user_data = data.get("result", {}).get("response", {}) if "result" in data else data
-
-                    # Clean the user data to remove masked, null, empty, and UUID fields
-                    cleaned_user_data = clean_user_data(raw_user_data)
-
-                    logger.info("User details fetched and cleaned successfully")
-                    logger.info(
-                        f"Original fields count: {len(raw_user_data) if isinstance(raw_user_data, dict) else 0}")
-                    logger.info(f"Cleaned fields count: {len(cleaned_user_data)}")
-
-                    return cleaned_user_data
-                elif response.status_code == 401:
-                    raise UserDetailsError("Authentication failed - invalid cookie")
-                elif response.status_code == 403:
-                    raise UserDetailsError("Access forbidden - insufficient permissions")
-                else:
-                    raise UserDetailsError(
-                        f"User details API failed with status {response.status_code}: {response.text}")
+            client = get_http_client()
+            logger.info(f"Calling user details API: {url}")
+            response = await client.get(url, headers=headers)
+
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                raw_user_data = data.get("result", {}).get("response", {}) if "result" in data else data
+
+                # Clean the user data to remove masked, null, empty, and UUID fields
+                cleaned_user_data = clean_user_data(raw_user_data)
+
+                logger.info("User details fetched and cleaned successfully")
+                logger.info(
+                    f"Original fields count: {len(raw_user_data) if isinstance(raw_user_data, dict) else 0}")
+                logger.info(f"Cleaned fields count: {len(cleaned_user_data)}")
+
+                return cleaned_user_data
+            elif response.status_code == 401:
+                raise UserDetailsError("Authentication failed - invalid cookie")
+            elif response.status_code == 403:
+                raise UserDetailsError("Access forbidden - insufficient permissions")
+            else:
+                raise UserDetailsError(
+                    f"User details API failed with status {response.status_code}: {response.text}")
 
         except httpx.TimeoutException:
             raise UserDetailsError("User details API request timed out")
@@ -669,51 +665,41 @@ class UserDetailsService:
             return ({}, [])
 
         url = f"{self.lms_service_url}{self.private_course_enrol_list_api}{user_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        # post request body
-        requests_body = {
-            "request": {
-                "retiredCoursesEnabled": True,
-                "status": ["In-Progress", "Completed"]
-            }
-        }
+        headers = self._json_headers
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling course enrollment API: {url}")
-                response = await client.post(url, headers=headers, json=requests_body)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    enrollments_result = data.get("result", {}) if "result" in data else data
-                    enrollments = enrollments_result.get("courses", [])
-                    ext_enrollments = enrollments_result.get("external_courses", [])
-                    logger.info(f"Fetched {len(enrollments)} course enrollments")
-                    user_course_enrollment_info = enrollments_result.get("userCourseEnrolmentInfo", {})
-                    user_ext_course_enrollment_info = enrollments_result.get("userExternalCourseEnrolmentInfo", {})
-
-                    # merge user_course_enrollment_info and user_ext_course_enrollment_info
-                    merged_info = merge_enrollment_info(user_course_enrollment_info, user_ext_course_enrollment_info)
-
-                    logger.debug(f"_fetch_course_enrollments:: enrollments BEFORE: {len(enrollments)}")
-                    logger.debug(f"_fetch_course_enrollments:: ext_enrollments BEFORE: {len(ext_enrollments)}")
-
-                    # add ext_enrollments to enrollments if they exist
-                    if isinstance(ext_enrollments, list) and len(ext_enrollments) > 0:
-                        enrollments.extend(ext_enrollments)
-
-                    logger.debug(f"_fetch_course_enrollments:: enrollments AFTER: {len(enrollments)}")
-
-                    return (merged_info, enrollments) if isinstance(enrollments, list) else ({}, [])
-                elif response.status_code == 401:
-                    logger.error("Course enrollment API: Authentication failed")
-                    return ({}, [])
-                else:
-                    logger.error(f"Course enrollment API failed with status {response.status_code}")
-                    return ({}, [])
+            client = get_http_client()
+            logger.info(f"Calling course enrollment API: {url}")
+            response = await client.post(url, headers=headers, json=COURSE_ENROL_LIST_BODY)
+
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                enrollments_result = data.get("result", {}) if "result" in data else data
+                enrollments = enrollments_result.get("courses", [])
+                ext_enrollments = enrollments_result.get("external_courses", [])
+                logger.info(f"Fetched {len(enrollments)} course enrollments")
+                user_course_enrollment_info = enrollments_result.get("userCourseEnrolmentInfo", {})
+                user_ext_course_enrollment_info = enrollments_result.get("userExternalCourseEnrolmentInfo", {})
+
+                # merge user_course_enrollment_info and user_ext_course_enrollment_info
+                merged_info = merge_enrollment_info(user_course_enrollment_info, user_ext_course_enrollment_info)
+
+                logger.debug(f"_fetch_course_enrollments:: enrollments BEFORE: {len(enrollments)}")
+                logger.debug(f"_fetch_course_enrollments:: ext_enrollments BEFORE: {len(ext_enrollments)}")
+
+                # add ext_enrollments to enrollments if they exist
+                if isinstance(ext_enrollments, list) and len(ext_enrollments) > 0:
+                    enrollments.extend(ext_enrollments)
+
+                logger.debug(f"_fetch_course_enrollments:: enrollments AFTER: {len(enrollments)}")
+
+                return (merged_info, enrollments) if isinstance(enrollments, list) else ({}, [])
+            elif response.status_code == 401:
+                logger.error("Course enrollment API: Authentication failed")
+                return ({}, [])
+            else:
+                logger.error(f"Course enrollment API failed with status {response.status_code}")
+                return ({}, [])
 
         except httpx.TimeoutException:
             logger.error("Course enrollment API request timed out")
@@ -737,28 +723,25 @@ class UserDetailsService:
             return []
 
         url = f"{self.lms_service_url}{self.private_event_enrol_list_api}{user_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        headers = self._json_headers
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling event enrollment API: {url}")
-                response = await client.get(url, headers=headers)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    enrollments_result = data.get("result", {}) if "result" in data else data
-                    enrollments = enrollments_result.get("events", [])
-                    logger.info(f"Fetched {len(enrollments)} event enrollments")
-                    return enrollments if isinstance(enrollments, list) else []
-                elif response.status_code == 401:
-                    logger.error("Event enrollment API: Authentication failed")
-                    return []
-                else:
-                    logger.error(f"Event enrollment API failed with status {response.status_code}")
-                    return []
+            client = get_http_client()
+            logger.info(f"Calling event enrollment API: {url}")
+            response = await client.get(url, headers=headers)
+
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                enrollments_result = data.get("result", {}) if "result" in data else data
+                enrollments = enrollments_result.get("events", [])
+                logger.info(f"Fetched {len(enrollments)} event enrollments")
+                return enrollments if isinstance(enrollments, list) else []
+            elif response.status_code == 401:
+                logger.error("Event enrollment API: Authentication failed")
+                return []
+            else:
+                logger.error(f"Event enrollment API failed with status {response.status_code}")
+                return []
 
         except httpx.TimeoutException:
             logger.error("Event enrollment API request timed out")
@@ -786,10 +769,7 @@ class UserDetailsService:
             return False
 
         url = f"{self.sb_cb_ext_service_url}{self.private_user_update_api}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        headers = self._json_headers
         logger.info(f"update_profile:: profile_data: {profile_data}")
 
         # if profile_data contains profileDetails.professionalDetails[0].verifiedKarmayogi and if it is not String, convert it to String
@@ -802,18 +782,18 @@ class UserDetailsService:
                         professional_details[0]['verifiedKarmayogi'] = str(verified_karmayogi)
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling user profile update API: {url}")
-                response = await client.patch(url, headers=headers, json=profile_data)
-
-                if response.status_code == 200:
-                    logger.info("User profile updated successfully")
-                    return True
-                elif response.status_code == 401:
-                    raise UserDetailsError("Authentication failed - invalid API key")
-                else:
-                    raise UserDetailsError(
-                        f"Profile update API failed with status {response.status_code}: {response.text}")
+            client = get_http_client()
+            logger.info(f"Calling user profile update API: {url}")
+            response = await client.patch(url, headers=headers, json=profile_data)
+
+            if response.status_code == 200:
+                logger.info("User profile updated successfully")
+                return True
+            elif response.status_code == 401:
+                raise UserDetailsError("Authentication failed - invalid API key")
+            else:
+                raise UserDetailsError(
+                    f"Profile update API failed with status {response.status_code}: {response.text}")
 
         except httpx.TimeoutException:
             raise UserDetailsError("Profile update API request timed out")
@@ -822,15 +802,11 @@ class UserDetailsService:
 
     async def otp_generate(self, mode: str, value: str) -> bool:
         # Code to invoke the OTP generation API
-        service = UserDetailsService()
-        if not service.api_key:
+        if not self.api_key:
             logger.warning("API key not available, skipping OTP generation")
             return False
-        url = f"{service.learning_service_url}{service.otp_generate_api}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {service.api_key}"
-        }
+        url = f"{self.learning_service_url}{self.otp_generate_api}"
+        headers = self._json_headers
         requests_body = {
             "request": {
                 "type": mode,
@@ -839,18 +815,18 @@ class UserDetailsService:
         }
         logger.info(f"otp_generate:: requests_body: {requests_body}")
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling OTP generation API: {url}")
-                response = await client.post(url, headers=headers, json=requests_body)
-
-                if response.status_code == 200:
-                    logger.info("OTP generated successfully")
-                    return True
-                elif response.status_code == 401:
-                    raise UserDetailsError("Authentication failed - invalid API key")
-                else:
-                    raise UserDetailsError(
-                        f"OTP generation API failed with status {response.status_code}: {response.text}")
+            client = get_http_client()
+            logger.info(f"Calling OTP generation API: {url}")
+            response = await client.post(url, headers=headers, json=requests_body)
+
+            if response.status_code == 200:
+                logger.info("OTP generated successfully")
+                return True
+            elif response.status_code == 401:
+                raise UserDetailsError("Authentication failed - invalid API key")
+            else:
+                raise UserDetailsError(
+                    f"OTP generation API failed with status {response.status_code}: {response.text}")
 
         except httpx.TimeoutException:
             raise UserDetailsError("OTP generation API request timed out")
@@ -859,15 +835,11 @@ class UserDetailsService:
 
     async def otp_verify(self, mode: str, value: str, otp: str) -> bool:
         # Code to invoke the OTP verification API
-        service = UserDetailsService()
-        if not service.api_key:
+        if not self.api_key:
             logger.warning("API key not available, skipping OTP verification")
             return False
-        url = f"{service.learning_service_url}{service.otp_verify_api}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {service.api_key}"
-        }
+        url = f"{self.learning_service_url}{self.otp_verify_api}"
+        headers = self._json_headers
         requests_body = {
             "request": {
                 "type": mode,
@@ -877,18 +849,18 @@ class UserDetailsService:
         }
         logger.info(f"otp_verify:: requests_body: {requests_body}")
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Calling OTP verification API: {url}")
-                response = await client.post(url, headers=headers, json=requests_body)
-
-                if response.status_code == 200:
-                    logger.info("OTP verified successfully")
-                    return True
-                elif response.status_code == 401:
-                    raise UserDetailsError("Authentication failed - invalid API key")
-                else:
-                    raise UserDetailsError(
-                        f"OTP verification API failed with status {response.status_code}: {response.text}")
+            client = get_http_client()
+            logger.info(f"Calling OTP verification API: {url}")
+            response = await client.post(url, headers=headers, json=requests_body)
+
+            if response.status_code == 200:
+                logger.info("OTP verified successfully")
+                return True
+            elif response.status_code == 401:
+                raise UserDetailsError("Authentication failed - invalid API key")
+            else:
+                raise UserDetailsError(
+                    f"OTP verification API failed with status {response.status_code}: {response.text}")
 
         except httpx.TimeoutException:
             raise UserDetailsError("OTP verification API request timed out")
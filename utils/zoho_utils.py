@@ -38,6 +38,7 @@ Usage:
     )
 """
 
+import asyncio
 import json
 import logging
 import os
@@ -45,10 +46,16 @@ import time
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 from dataclasses import dataclass
-import httpx
+import orjson
+
+from utils.http_client import get_http_client
+from utils.redis_connection_manager import get_redis_client
 
 logger = logging.getLogger(__name__)
 
+# Access token shared by all workers; Zoho rate-limits refresh-token grants
+ZOHO_TOKEN_CACHE_KEY = "zoho:access_token"
+
 
 class ZohoTicketPriority(Enum):
     """Zoho Desk ticket priorities"""
@@ -121,6 +128,7 @@ class ZohoDesk:
         # Token management
         self._access_token = None
         self._token_expiry = 0
+        self._token_lock = asyncio.Lock()
 
         # Validate configuration
         self._validate_config()
@@ -144,12 +152,41 @@ class ZohoDesk:
         Returns:
             Access token string or None if failed
         """
-        try:
-            logger.info("Fetching Zoho access token")
-            # Check if current token is still valid
+        if not force_refresh and self._access_token and time.time() < self._token_expiry:
+            return self._access_token
+
+        async with self._token_lock:
+            # Another request may have refreshed the token while this one waited
             if not force_refresh and self._access_token and time.time() < self._token_expiry:
                 return self._access_token
 
+            if not force_refresh and await self._load_shared_token():
+                return self._access_token
+
+            return await self._refresh_access_token()
+
+    async def _load_shared_token(self) -> bool:
+        """Adopt a token another worker already obtained, if Redis has one"""
+        try:
+            redis_client = await get_redis_client()
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(ZOHO_TOKEN_CACHE_KEY)
+            pipe.ttl(ZOHO_TOKEN_CACHE_KEY)
+            token, ttl = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not read shared Zoho access token: {e}")
+            return False
+
+        if not token or ttl <= 0:
+            return False
+        self._access_token = token
+        self._token_expiry = time.time() + ttl
+        logger.debug("Using shared Zoho access token")
+        return True
+
+    async def _refresh_access_token(self) -> Optional[str]:
+        """Obtain a new access token from Zoho and share it through Redis"""
+        try:
             logger.info("Refreshing Zoho access token")
 
             url = "https://accounts.zoho.in/oauth/v2/token"
@@ -161,25 +198,36 @@ class ZohoDesk:
                 'grant_type': 'refresh_token'
             }
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, params=params)
+            client = get_http_client()
+            response = await client.post(url, params=params)
 
-                if response.status_code == 200:
-                    token_data = response.json()
-                    self._access_token = token_data.get('access_token')
-                    expires_in = token_data.get('expires_in', 3600)
-                    self._token_expiry = time.time() + expires_in - 300  # 5 min buffer
+            if response.status_code == 200:
+                token_data = response.json()
+                self._access_token = token_data.get('access_token')
+                valid_for = token_data.get('expires_in', 3600) - 300  # 5 min buffer
+                self._token_expiry = time.time() + valid_for
 
-                    logger.info("Successfully obtained Zoho access token")
-                    return self._access_token
-                else:
-                    logger.error(f"Failed to get Zoho access token: {response.status_code} - {response.text}")
-                    return None
+                logger.info("Successfully obtained Zoho access token")
+                await self._store_shared_token(valid_for)
+                return self._access_token
+            else:
+                logger.error(f"Failed to get Zoho access token: {response.status_code} - {response.text}")
+                return None
 
         except Exception as e:
             logger.error(f"Error getting Zoho access token: {e}")
             return None
 
+    async def _store_shared_token(self, valid_for: int):
+        """Publish the current access token to the other workers"""
+        if not self._access_token or valid_for <= 0:
+            return
+        try:
+            redis_client = await get_redis_client()
+            await redis_client.set(ZOHO_TOKEN_CACHE_KEY, self._access_token, ex=int(valid_for))
+        except Exception as e:
+            logger.warning(f"Could not share Zoho access token: {e}")
+
     async def _make_api_request(self, method: str, endpoint: str, data: Dict = None,
                                 params: Dict = None, retry_count: int = 3) -> Tuple[bool, Dict]:
         """
@@ -208,31 +256,31 @@ class ZohoDesk:
                     "Content-Type": "application/json"
                 }
 
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    if method.upper() == 'GET':
-                        response = await client.get(url, headers=headers, params=params)
-                    elif method.upper() == 'POST':
-                        response = await client.post(url, headers=headers, json=data, params=params)
-                    elif method.upper() == 'PUT':
-                        response = await client.put(url, headers=headers, json=data, params=params)
-                    elif method.upper() == 'DELETE':
-                        response = await client.delete(url, headers=headers, params=params)
-                    else:
-                        return False, {"error": f"Unsupported HTTP method: {method}"}
-
-                    if response.status_code in [200, 201]:
-                        return True, response.json()
-                    elif response.status_code == 401 and attempt < retry_count - 1:
-                        # Token might be expired, refresh and retry
-                        logger.warning("Access token expired, refreshing...")
-                        await self.get_access_token(force_refresh=True)
-                        continue
-                    else:
-                        logger.error(f"Zoho API request failed: {response.status_code} - {response.text}")
-                        return False, {
-                            "error": f"API request failed with status {response.status_code}",
-                            "details": response.text
-                        }
+                client = get_http_client()
+                if method.upper() == 'GET':
+                    response = await client.get(url, headers=headers, params=params, timeout=60.0)
+                elif method.upper() == 'POST':
+                    response = await client.post(url, headers=headers, json=data, params=params, timeout=60.0)
+                elif method.upper() == 'PUT':
+                    response = await client.put(url, headers=headers, json=data, params=params, timeout=60.0)
+                elif method.upper() == 'DELETE':
+                    response = await client.delete(url, headers=headers, params=params, timeout=60.0)
+                else:
+                    return False, {"error": f"Unsupported HTTP method: {method}"}
+
+                if response.status_code in [200, 201]:
+                    return True, orjson.loads(response.content)
+                elif response.status_code == 401 and attempt < retry_count - 1:
+                    # Token might be expired, refresh and retry
+                    logger.warning("Access token expired, refreshing...")
+                    await self.get_access_token(force_refresh=True)
+                    continue
+                else:
+                    logger.error(f"Zoho API request failed: {response.status_code} - {response.text}")
+                    return False, {
+                        "error": f"API request failed with status {response.status_code}",
+                        "details": response.text
+                    }
 
             except Exception as e:
                 logger.error(f"Error making Zoho API request (attempt {attempt + 1}): {e}")